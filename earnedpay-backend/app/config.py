@@ -15,8 +15,75 @@ class Settings(BaseSettings):
     # CORS
     allowed_origins: str = "http://localhost:3000"
     
+    # Frontend URL used in invitation links
+    app_url: str = "http://localhost:3000"
+    
     # UPI
     upi_mock_mode: bool = True
+    upi_timeout_seconds: float = 10.0
+    
+    # Payout gateway circuit breaker
+    upi_breaker_window: int = 20
+    upi_breaker_min_calls: int = 10
+    upi_breaker_failure_rate: float = 0.5
+    upi_breaker_slow_call_seconds: float = 3.0
+    upi_breaker_open_seconds: int = 30
+    upi_breaker_half_open_calls: int = 3
+    
+    # Cache (leave cache_redis_url empty for in-process caching only)
+    cache_redis_url: str = ""
+    cache_local_max_entries: int = 10000
+    cache_default_ttl: int = 300
+    
+    # Conditional GET version index
+    etag_version_ttl: int = 60
+    
+    # Withdrawal rate limits
+    withdraw_worker_per_minute: float = 2
+    withdraw_worker_burst: int = 3
+    withdraw_employer_per_minute: float = 120
+    withdraw_employer_burst: int = 60
+    max_inflight_payouts: int = 20
+    
+    # Load shedding (per gunicorn worker)
+    load_shed_max_inflight: int = 64
+    load_shed_target_lag_ms: float = 50.0
+    
+    # Withdrawal risk scoring (scores 0-100)
+    risk_review_score: int = 50
+    risk_block_score: int = 80
+    risk_max_withdrawals_per_hour: int = 3
+    risk_max_withdrawals_per_day: int = 6
+    risk_max_workers_per_upi: int = 3
+    
+    # Firestore read policy (deadline per call, retries for transient errors,
+    # hedged second request after the operation's recent p95 latency)
+    read_deadline_ms: int = 2000
+    read_retries: int = 2
+    read_retry_base_ms: int = 50
+    read_hedge_enabled: bool = True
+    read_hedge_min_delay_ms: int = 10
+    read_pool_size: int = 32
+    
+    # Notification provider send rates (messages/second), "provider:rate,..."
+    notification_rate_limits: str = "whatsapp:80,sms:20"
+    
+    # Attendance analytics (per process; seconds before a loaded year is re-read)
+    attendance_analytics_ttl: int = 300
+    attendance_analytics_max_stores: int = 200
+    
+    # Seconds an employer's active-worker roster stays cached
+    roster_cache_ttl: int = 600
+    
+    # Cold storage for settled months: a Firebase Storage bucket, or a local
+    # directory when no bucket is set (archive_months needs --allow-local).
+    # Months are archived once they are this many months behind the current one.
+    archive_bucket: str = ""
+    archive_dir: str = "archive"
+    archive_after_months: int = 3
+    
+    # customId numbers reserved per process at a time
+    custom_id_block_size: int = 50
     
     # Server
     host: str = "0.0.0.0"
@@ -38,6 +105,16 @@ class Settings(BaseSettings):
     def allowed_origins_list(self) -> list[str]:
         """Parse allowed origins from comma-separated string"""
         return [origin.strip() for origin in self.allowed_origins.split(",")]
+    
+    @property
+    def notification_rate_limits_dict(self) -> dict[str, float]:
+        """Parse provider send rates from "provider:rate" pairs"""
+        limits = {}
+        for pair in self.notification_rate_limits.split(","):
+            if pair.strip():
+                provider, rate = pair.split(":")
+                limits[provider.strip()] = float(rate)
+        return limits
 
 
 settings = Settings()
@@ -1,6 +1,7 @@
-from fastapi import Header, HTTPException, status, Depends
+from fastapi import Header, HTTPException, Query, Request, status, Depends
 from typing import Optional
 from app.services.firebase_service import firebase_service
+from app.services.read_policy import read_policy
 import logging
 
 logger = logging.getLogger(__name__)
@@ -53,35 +54,78 @@ async def get_current_user(firebase_user: dict = Depends(get_firebase_user)) ->
     return user
 
 
-async def get_current_worker(current_user: dict = None) -> dict:
+async def get_stream_user(
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None)
+) -> dict:
     """
-    Dependency to ensure current user is a worker
+    Dependency for streaming endpoints: accepts the ID token as `?token=`
+    because EventSource and WebSocket clients cannot set headers
     """
-    if not current_user:
-        from fastapi import Depends
-        current_user = Depends(get_current_user)
+    if token:
+        authorization = f"Bearer {token}"
+    
+    firebase_user = await get_firebase_user(authorization)
+    return await get_current_user(firebase_user)
+
+
+# Role -> collection holding that role's profile document
+PROFILE_COLLECTIONS = {"worker": "workers", "employer": "employers"}
+
+
+async def _get_role_user(request: Request, firebase_user: dict, role: str) -> dict:
+    uid = firebase_user.get("uid")
+    user, profile_doc = await firebase_service.get_user_with_profile(uid, PROFILE_COLLECTIONS[role])
     
-    if current_user.get("role") != "worker":
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not registered"
+        )
+    
+    if user.get("role") != role:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Worker role required."
+            detail=f"Access denied. {role.capitalize()} role required."
         )
     
-    return current_user
+    if profile_doc is not None:
+        request.state.profile_doc = profile_doc
+    return user
+
+
+async def get_current_worker(
+    request: Request,
+    firebase_user: dict = Depends(get_firebase_user)
+) -> dict:
+    """
+    Dependency to ensure current user is a worker
+    
+    On a user cache miss the worker profile is read in the same round
+    trip and kept for `get_profile_doc`.
+    """
+    return await _get_role_user(request, firebase_user, "worker")
 
 
-async def get_current_employer(current_user: dict = None) -> dict:
+async def get_current_employer(
+    request: Request,
+    firebase_user: dict = Depends(get_firebase_user)
+) -> dict:
     """
     Dependency to ensure current user is an employer
-    """
-    if not current_user:
-        from fastapi import Depends
-        current_user = Depends(get_current_user)
     
-    if current_user.get("role") != "employer":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
-        )
-    
-    return current_user
+    On a user cache miss the employer profile is read in the same round
+    trip and kept for `get_profile_doc`.
+    """
+    return await _get_role_user(request, firebase_user, "employer")
+
+
+async def get_profile_doc(request: Request, current_user: dict):
+    """Current user's worker/employer profile snapshot, read at most once per request"""
+    profile_doc = getattr(request.state, "profile_doc", None)
+    if profile_doc is None:
+        collection = PROFILE_COLLECTIONS[current_user["role"]]
+        profile_ref = firebase_service.db.collection(collection).document(current_user["uid"])
+        profile_doc = await read_policy.call_async(f"{collection}.get", profile_ref.get)
+        request.state.profile_doc = profile_doc
+    return profile_doc
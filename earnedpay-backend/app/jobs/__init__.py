@@ -0,0 +1 @@
+"""Operator jobs run from the command line (python -m app.jobs.<name>)"""
@@ -0,0 +1,247 @@
+"""
+Move settled employer-months out of the hot collections into cold storage
+
+An employer-month is archived once it has a settlement, is at least
+`archive_after_months` behind the current month, has no active ledgers and
+no unresolved withdrawals. Its attendance, wage ledgers and withdrawals
+are streamed with paginated queries and written as gzipped JSON Lines
+files (one per collection, see `archive_service`). Each file is read back
+and checked against the documents it replaces before a tombstone is
+written to `archives/{employerId}_{YYYY-MM}` and the originals are deleted
+in chunked batches.
+
+The tombstone is written with status `deleting` and set to `archived` once
+the deletes are committed, so a run interrupted mid-delete resumes by
+deleting the remaining documents listed in the archive files.
+
+Archive files must outlive the machine that wrote them, so without
+`archive_bucket` the job refuses to delete anything unless --allow-local is
+given (e.g. for development against a persistent `archive_dir`).
+
+Usage:
+    python -m app.jobs.archive_months [--before YYYY-MM] [--employer ID] [--concurrency N] [--allow-local] [--dry-run]
+"""
+from app.config import settings
+from app.models.withdrawal import UNRESOLVED_WITHDRAWAL_STATES
+from app.services.archive_service import archive_service, ARCHIVED_COLLECTIONS
+from app.services.firebase_service import firebase_service
+from app.services.version_index import version_index
+from app.utils.batching import BatchWriter
+from app.utils.months import month_bounds
+from app.utils.pagination import paginate
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+from typing import Optional
+import argparse
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def settled_months(before: str, employer_id: Optional[str] = None) -> list[tuple[str, str]]:
+    """(employerId, month) pairs with a settlement for a month before `before`"""
+    settlements = firebase_service.db.collection('settlements')
+    if employer_id:
+        query = settlements.where('employerId', '==', employer_id).select(['employerId', 'month'])
+    else:
+        query = settlements.where('month', '<', before).select(['employerId', 'month'])
+
+    return sorted({
+        (doc.get('employerId'), doc.get('month'))
+        for doc in query.stream()
+        if doc.get('month') < before
+    })
+
+
+def month_queries(employer_id: str, month: str) -> dict:
+    """Ordered queries for an employer-month's documents, per collection"""
+    db = firebase_service.db
+    start, end = month_bounds(month)
+    return {
+        "attendance": db.collection('attendance')
+            .where('employerId', '==', employer_id)
+            .where('date', '>=', start)
+            .where('date', '<', end)
+            .order_by('date'),
+        "wage_ledgers": db.collection('wage_ledgers')
+            .where('employerId', '==', employer_id)
+            .where('month', '==', month)
+            .order_by('__name__'),
+        "withdrawals": db.collection('withdrawals')
+            .where('employerId', '==', employer_id)
+            .where('requestedAt', '>=', start)
+            .where('requestedAt', '<', end)
+            .order_by('requestedAt')
+    }
+
+
+def delete_archived(employer_id: str, month: str, dry_run: bool = False) -> int:
+    """Delete the hot copies of every document listed in an employer-month's archive files"""
+    db = firebase_service.db
+    deleted = 0
+    ledger_ids = []
+    with BatchWriter(db, dry_run=dry_run) as writer:
+        for collection in ARCHIVED_COLLECTIONS:
+            for record in archive_service.read(employer_id, month, collection):
+                writer.delete(db.collection(collection).document(record['id']))
+                deleted += 1
+                if collection == 'wage_ledgers':
+                    ledger_ids.append(record['id'])
+
+    if not dry_run:
+        for ledger_id in ledger_ids:
+            version_index.touch(f"wage_ledgers/{ledger_id}")
+    return deleted
+
+
+def archive_month(
+    employer_id: str,
+    month: str,
+    dry_run: bool = False,
+    page_size: int = 500,
+    allow_local: bool = False
+) -> dict:
+    """Archive one employer-month and delete the originals"""
+    result = {"employer_id": employer_id, "month": month}
+    if not dry_run and not settings.archive_bucket and not allow_local:
+        raise RuntimeError("archive_bucket is not set; refusing to delete documents archived to local disk")
+
+    tombstone = archive_service.get_tombstone(employer_id, month)
+    if tombstone and tombstone.get('status') == 'archived':
+        return {**result, "status": "already_archived"}
+    if tombstone:
+        deleted = delete_archived(employer_id, month, dry_run)
+        if not dry_run:
+            archive_service.write_tombstone(employer_id, month, {
+                **tombstone, "status": "archived", "deletedAt": datetime.utcnow()
+            })
+        return {**result, "status": "resumed", "deleted": deleted}
+
+    queries = month_queries(employer_id, month)
+    if list(queries["wage_ledgers"].where('status', '==', 'active').limit(1).stream()):
+        return {**result, "status": "not_settled"}
+    if list(queries["withdrawals"].where('status', 'in', UNRESOLVED_WITHDRAWAL_STATES).limit(1).stream()):
+        return {**result, "status": "withdrawals_in_flight"}
+
+    docs = {collection: list(paginate(query, page_size)) for collection, query in queries.items()}
+    counts = {collection: len(collection_docs) for collection, collection_docs in docs.items()}
+    if dry_run:
+        return {**result, "status": "would_archive", **counts}
+
+    files = {}
+    for collection, collection_docs in docs.items():
+        archive_service.write(
+            employer_id, month, collection,
+            ({"id": doc.id, **doc.to_dict()} for doc in collection_docs)
+        )
+        archived_ids = [record['id'] for record in archive_service.read(employer_id, month, collection)]
+        if archived_ids != [doc.id for doc in collection_docs]:
+            raise RuntimeError(f"Archive verification failed for {collection}")
+        files[collection] = archive_service.path(employer_id, month, collection)
+
+    ledgers = [doc.to_dict() for doc in docs["wage_ledgers"]]
+    tombstone = {
+        "employerId": employer_id,
+        "month": month,
+        "status": "deleting",
+        "counts": counts,
+        "files": files,
+        "backend": "bucket" if settings.archive_bucket else "local",
+        "totalEarnings": sum(ledger.get('totalEarned', 0.0) for ledger in ledgers),
+        "totalWithdrawals": sum(ledger.get('totalWithdrawn', 0.0) for ledger in ledgers),
+        "archivedAt": datetime.utcnow()
+    }
+    archive_service.write_tombstone(employer_id, month, tombstone)
+
+    deleted = delete_archived(employer_id, month)
+    archive_service.write_tombstone(employer_id, month, {
+        **tombstone, "status": "archived", "deletedAt": datetime.utcnow()
+    })
+    return {**result, "status": "archived", "deleted": deleted, **counts}
+
+
+def run_archive(
+    before: str,
+    employer_id: Optional[str] = None,
+    concurrency: int = 4,
+    dry_run: bool = False,
+    page_size: int = 500,
+    allow_local: bool = False
+) -> dict:
+    """Archive every settled employer-month before `before`"""
+    start_time = time.perf_counter()
+    months = settled_months(before, employer_id)
+    logger.info(f"Found {len(months)} settled employer-months before {before}")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(archive_month, employer, month, dry_run, page_size, allow_local): (employer, month)
+            for employer, month in months
+        }
+        for future in as_completed(futures):
+            employer, month = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Archiving failed for employer {employer} ({month}): {e}")
+                results.append({"employer_id": employer, "month": month, "status": "failed", "error": str(e)})
+
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    summary = {
+        "before": before,
+        "dry_run": dry_run,
+        "employer_months": len(results),
+        "statuses": statuses,
+        **{
+            collection: sum(result.get(collection, 0) for result in results)
+            for collection in ARCHIVED_COLLECTIONS
+        },
+        "deleted": sum(result.get("deleted", 0) for result in results),
+        "elapsed_seconds": round(time.perf_counter() - start_time, 2)
+    }
+    return {"summary": summary, "employer_months": sorted(results, key=lambda r: (r["employer_id"], r["month"]))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive settled months to cold storage")
+    parser.add_argument("--before", default=None, help="Archive months before this one (YYYY-MM); defaults to archive_after_months ago")
+    parser.add_argument("--employer", default=None, help="Only archive this employer")
+    parser.add_argument("--concurrency", type=int, default=4, help="Employer-months archived in parallel")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents per query page")
+    parser.add_argument("--allow-local", action="store_true", help="Archive to archive_dir when archive_bucket is not set")
+    parser.add_argument("--dry-run", action="store_true", help="Count documents without writing or deleting")
+    args = parser.parse_args()
+
+    if not settings.archive_bucket and not args.allow_local and not args.dry_run:
+        parser.error("ARCHIVE_BUCKET is not set; pass --allow-local to archive to the local archive_dir")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.before:
+        datetime.strptime(args.before, "%Y-%m")
+        before = args.before
+    else:
+        before = (datetime.utcnow().replace(day=1) - relativedelta(months=settings.archive_after_months - 1)).strftime("%Y-%m")
+
+    report = run_archive(
+        before,
+        employer_id=args.employer,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
+        page_size=args.page_size,
+        allow_local=args.allow_local
+    )
+    print(json.dumps(report, indent=2, default=str))
+
+    if report["summary"]["statuses"].get("failed"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Rewrite wage ledgers and attendance records to deterministic document IDs
+
+Ledgers move to `{workerId}_{YYYY-MM}` and attendance to
+`{workerId}_{YYYY-MM-DD}`. Withdrawals referencing a moved ledger have their
+`ledgerId` rewritten. Duplicate attendance for the same worker and day is
+collapsed to the most recent record.
+
+Usage:
+    python -m app.jobs.migrate_document_keys [--dry-run]
+"""
+from app.services.firebase_service import firebase_service
+from app.utils.batching import BatchWriter
+from app.utils.document_keys import ledger_doc_id, attendance_doc_id
+from datetime import datetime
+import argparse
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_ledgers(db, writer: BatchWriter) -> dict:
+    """Move wage ledgers to `{workerId}_{month}` IDs"""
+    stats = {"scanned": 0, "moved": 0, "conflicts": 0, "withdrawals_relinked": 0}
+    targets = set()
+
+    for doc in db.collection('wage_ledgers').stream():
+        stats["scanned"] += 1
+        data = doc.to_dict()
+        target_id = ledger_doc_id(data['workerId'], data['month'])
+
+        if doc.id == target_id:
+            targets.add(target_id)
+            continue
+
+        target_ref = db.collection('wage_ledgers').document(target_id)
+        if target_id in targets or target_ref.get().exists:
+            # Two ledgers for one worker-month need a manual decision
+            logger.warning(f"Ledger {doc.id} conflicts with existing {target_id}, skipping")
+            stats["conflicts"] += 1
+            continue
+
+        targets.add(target_id)
+        writer.set(target_ref, data)
+
+        withdrawals_query = db.collection('withdrawals').where('ledgerId', '==', doc.id)
+        for withdrawal_doc in withdrawals_query.stream():
+            writer.update(withdrawal_doc.reference, {"ledgerId": target_id})
+            stats["withdrawals_relinked"] += 1
+
+        writer.delete(doc.reference)
+        stats["moved"] += 1
+
+    return stats
+
+
+def migrate_attendance(db, writer: BatchWriter) -> dict:
+    """Move attendance records to `{workerId}_{date}` IDs"""
+    stats = {"scanned": 0, "moved": 0, "duplicates_removed": 0}
+
+    # Pick the most recent record for each worker-day before writing anything
+    latest = {}
+    for doc in db.collection('attendance').stream():
+        stats["scanned"] += 1
+        data = doc.to_dict()
+        target_id = attendance_doc_id(data['workerId'], data['date'].strftime("%Y-%m-%d"))
+
+        current = latest.get(target_id)
+        if current is None:
+            latest[target_id] = (doc, [])
+            continue
+
+        current_doc, stale = current
+        created_at = data.get('createdAt') or datetime.min
+        current_created_at = current_doc.to_dict().get('createdAt') or datetime.min
+        if created_at.replace(tzinfo=None) > current_created_at.replace(tzinfo=None):
+            latest[target_id] = (doc, stale + [current_doc])
+        else:
+            stale.append(doc)
+
+    for target_id, (doc, stale) in latest.items():
+        if doc.id != target_id:
+            writer.set(db.collection('attendance').document(target_id), doc.to_dict())
+            writer.delete(doc.reference)
+            stats["moved"] += 1
+
+        for stale_doc in stale:
+            if stale_doc.id != target_id:
+                logger.warning(
+                    f"Removing duplicate attendance {stale_doc.id} for {target_id}; "
+                    f"ledger totals for this worker may need a rebuild"
+                )
+                writer.delete(stale_doc.reference)
+                stats["duplicates_removed"] += 1
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate ledgers and attendance to deterministic IDs")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    db = firebase_service.db
+    start_time = time.time()
+
+    with BatchWriter(db, dry_run=args.dry_run) as writer:
+        ledger_stats = migrate_ledgers(db, writer)
+    logger.info(f"Ledgers: {ledger_stats}")
+
+    with BatchWriter(db, dry_run=args.dry_run) as writer:
+        attendance_stats = migrate_attendance(db, writer)
+    logger.info(f"Attendance: {attendance_stats}")
+
+    logger.info(
+        f"Migration {'dry run ' if args.dry_run else ''}completed in {time.time() - start_time:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
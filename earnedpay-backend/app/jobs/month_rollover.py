@@ -0,0 +1,132 @@
+"""
+Pre-create next month's wage ledgers for every active worker
+
+Employers are processed in parallel; each employer's missing ledgers are
+created in chunked batches. Ledgers that already exist are left untouched,
+including ones attendance submission creates while the job runs (a chunk
+that hits one is retried document by document), so the job is safe to
+re-run (the Render cron runs it on each of the last days of the month).
+
+Usage:
+    python -m app.jobs.month_rollover [--month YYYY-MM] [--concurrency N] [--dry-run]
+"""
+from app.services.firebase_service import firebase_service
+from app.services.ledger_service import ledger_service
+from app.utils.batching import BatchWriter, MAX_BATCH_SIZE
+from app.utils.document_keys import ledger_doc_id
+from app.utils.months import next_month
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from google.api_core import exceptions as google_exceptions
+import argparse
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def rollover_employer(employer_doc, month: str, dry_run: bool = False) -> dict:
+    """Create missing ledgers for one employer's active workers"""
+    db = firebase_service.db
+    employer_id = employer_doc.id
+    employer_data = employer_doc.to_dict() or {}
+    payday_date = employer_data.get('withdrawalConfig', {}).get('paydayDate', 1)
+    month_start = datetime.strptime(month, "%Y-%m")
+
+    existing_ids = {
+        doc.id for doc in db.collection('wage_ledgers')
+        .where('employerId', '==', employer_id)
+        .where('month', '==', month)
+        .select([])
+        .stream()
+    }
+
+    workers_query = db.collection('workers') \
+        .where('employerId', '==', employer_id) \
+        .where('isActive', '==', True) \
+        .select([])
+
+    stats = {"employer_id": employer_id, "workers": 0, "created": 0, "existing": 0}
+    missing = []
+    for worker_doc in workers_query.stream():
+        stats["workers"] += 1
+        if ledger_doc_id(worker_doc.id, month) in existing_ids:
+            stats["existing"] += 1
+            continue
+
+        ledger_data = ledger_service.build_ledger(
+            worker_doc.id, employer_id, month, payday_date, reference=month_start
+        )
+        missing.append((ledger_service.ledger_ref(worker_doc.id, month), ledger_data))
+
+    # create() never overwrites a ledger that attendance submission created
+    # since the read above; one that exists fails its whole batch, so that
+    # chunk is retried one document at a time
+    for start in range(0, len(missing), MAX_BATCH_SIZE):
+        chunk = missing[start:start + MAX_BATCH_SIZE]
+        try:
+            with BatchWriter(db, dry_run=dry_run) as writer:
+                for ledger_ref, ledger_data in chunk:
+                    writer.create(ledger_ref, ledger_data)
+            stats["created"] += len(chunk)
+        except google_exceptions.AlreadyExists:
+            for ledger_ref, ledger_data in chunk:
+                try:
+                    ledger_ref.create(ledger_data)
+                    stats["created"] += 1
+                except google_exceptions.AlreadyExists:
+                    stats["existing"] += 1
+
+    return stats
+
+
+def run_rollover(month: str, concurrency: int = 8, dry_run: bool = False) -> dict:
+    """Create ledgers for `month` across all employers"""
+    start_time = time.time()
+    employer_docs = list(firebase_service.db.collection('employers').stream())
+
+    totals = {"employers": 0, "failed_employers": 0, "workers": 0, "created": 0, "existing": 0}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(rollover_employer, doc, month, dry_run): doc.id
+            for doc in employer_docs
+        }
+        for future in as_completed(futures):
+            employer_id = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                logger.error(f"Rollover failed for employer {employer_id}: {e}")
+                totals["failed_employers"] += 1
+                continue
+
+            totals["employers"] += 1
+            totals["workers"] += stats["workers"]
+            totals["created"] += stats["created"]
+            totals["existing"] += stats["existing"]
+
+    elapsed = time.time() - start_time
+    totals["elapsed_seconds"] = round(elapsed, 2)
+    totals["ledgers_per_second"] = round(totals["created"] / elapsed, 1) if elapsed else 0.0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-create wage ledgers for the next month")
+    parser.add_argument("--month", default=None, help="Target month (YYYY-MM), defaults to next month")
+    parser.add_argument("--concurrency", type=int, default=8, help="Employers processed in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    month = args.month or next_month()
+    totals = run_rollover(month, concurrency=args.concurrency, dry_run=args.dry_run)
+    logger.info(f"Rollover for {month}{' (dry run)' if args.dry_run else ''}: {totals}")
+
+    if totals["failed_employers"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Send payday reminders to every worker whose employer pays on a given day
+
+Employers whose `paydayDate` falls on the target day are processed a few at
+a time. Each employer's active ledgers for the current month are paged
+through; worker phone numbers are fetched with one batched read per page
+and the expected payday amount (earned - withdrawn) is sent through a
+dispatcher that bounds in-flight sends and applies per-provider rate limits
+(`notification_rate_limits`). After every page the last ledger ID is
+checkpointed under `reminder_runs/{date}/employers/{employerId}`, so a
+crashed run resumes after the last completed page (at most one page is
+re-sent). Ledgers whose send failed are kept in the checkpoint's `retry`
+list (up to RETRY_LIMIT) and an employer is only marked done once nothing is
+left to retry. Each run also resumes the unfinished checkpoints of earlier
+runs whose payday has not passed yet, so the daily schedule retries failed
+sends (and crashed employers) until payday.
+
+Usage:
+    python -m app.jobs.payday_reminders [--date YYYY-MM-DD] [--days-ahead N] [--concurrency N] [--dry-run]
+"""
+from app.config import settings
+from app.services.firebase_service import firebase_service
+from app.services.notification_service import notification_service
+from app.utils.pagination import paginate
+from datetime import date, datetime, timedelta
+from itertools import islice
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress log lines
+PROGRESS_INTERVAL = 10
+
+# Most failed ledgers kept for retry per employer checkpoint
+RETRY_LIMIT = 1000
+
+# Checkpoint states picked up again by later runs
+UNFINISHED_STATES = ["running", "incomplete"]
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second"""
+
+    def __init__(self, rate: float, burst: int):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class ReminderDispatcher:
+    """Send reminders with bounded concurrency and per-provider rate limits"""
+
+    def __init__(self, concurrency: int, rate_limits: dict, dry_run: bool = False):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._buckets = {
+            provider: TokenBucket(rate, burst=max(1, int(rate)))
+            for provider, rate in rate_limits.items()
+        }
+        self._dry_run = dry_run
+        self.sent = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    async def send(self, phone_number: str, payday_label: str, amount: float) -> bool:
+        async with self._semaphore:
+            if self._dry_run:
+                self.sent += 1
+                return True
+
+            bucket = self._buckets.get(notification_service.provider)
+            if bucket:
+                await bucket.acquire()
+            try:
+                await notification_service.send_payday_reminder(phone_number, payday_label, amount)
+            except Exception as e:
+                logger.error(f"Payday reminder to {phone_number} failed: {e}")
+                self.failed += 1
+                return False
+
+            self.sent += 1
+            return True
+
+    def progress(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1),
+            "sent_per_second": round(self.sent / elapsed, 1) if elapsed else 0.0
+        }
+
+
+def employers_paid_on(payday: date) -> list:
+    """Employers whose payday (clamped to the 28th, as in get_next_payday) is `payday`"""
+    employers_query = firebase_service.db.collection('employers').select(['withdrawalConfig'])
+    return [
+        doc for doc in employers_query.stream()
+        if min((doc.to_dict().get('withdrawalConfig') or {}).get('paydayDate', 1), 28) == payday.day
+    ]
+
+
+async def send_page(
+    ledger_docs: list,
+    payday_label: str,
+    dispatcher: ReminderDispatcher
+) -> tuple[int, list]:
+    """Remind the workers of one page of ledgers; returns (sent, failed ledger IDs)"""
+    db = firebase_service.db
+    ledgers = {doc.id: doc.to_dict() for doc in ledger_docs}
+    worker_refs = [db.collection('workers').document(ledger['workerId']) for ledger in ledgers.values()]
+    workers = {
+        doc.id: doc.to_dict()
+        for doc in await asyncio.to_thread(
+            lambda: list(db.get_all(worker_refs, field_paths=['phoneNumber', 'isActive']))
+        )
+        if doc.exists
+    }
+
+    ledger_ids = []
+    sends = []
+    for ledger_id, ledger in ledgers.items():
+        worker = workers.get(ledger['workerId'])
+        amount = round(ledger.get('totalEarned', 0.0) - ledger.get('totalWithdrawn', 0.0), 2)
+        if not worker or not worker.get('isActive') or not worker.get('phoneNumber') or amount <= 0:
+            continue
+        ledger_ids.append(ledger_id)
+        sends.append(dispatcher.send(worker['phoneNumber'], payday_label, amount))
+
+    results = await asyncio.gather(*sends)
+    failed = [ledger_id for ledger_id, ok in zip(ledger_ids, results) if not ok]
+    return sum(results), failed
+
+
+def unfinished_runs(today: date, payday: date) -> list[tuple[date, str]]:
+    """(payday, employerId) of unfinished checkpoints for paydays in [today, payday)"""
+    runs = firebase_service.db.collection('reminder_runs')
+    unfinished = []
+    day = today
+    while day < payday:
+        checkpoints = runs.document(day.isoformat()).collection('employers')
+        unfinished.extend(
+            (day, doc.id)
+            for doc in checkpoints.where('status', 'in', UNFINISHED_STATES).select([]).stream()
+        )
+        day += timedelta(days=1)
+    return unfinished
+
+
+def _cap_retry(retry: list, employer_id: str) -> list:
+    if len(retry) > RETRY_LIMIT:
+        logger.warning(f"Employer {employer_id}: {len(retry) - RETRY_LIMIT} failed reminders dropped from retry")
+    return retry[:RETRY_LIMIT]
+
+
+async def remind_employer(
+    employer_id: str,
+    payday: date,
+    month: str,
+    dispatcher: ReminderDispatcher,
+    checkpoints,
+    page_size: int,
+    dry_run: bool
+) -> dict:
+    """Remind one employer's workers, checkpointing after every page"""
+    db = firebase_service.db
+    checkpoint_ref = checkpoints.document(employer_id)
+    checkpoint = (await asyncio.to_thread(checkpoint_ref.get)).to_dict() or {}
+    if checkpoint.get('status') == 'done':
+        return {"employer_id": employer_id, "status": "skipped"}
+
+    ledgers_query = db.collection('wage_ledgers') \
+        .where('employerId', '==', employer_id) \
+        .where('month', '==', month) \
+        .where('status', '==', 'active') \
+        .order_by('__name__')
+    if checkpoint.get('cursor'):
+        cursor_doc = await asyncio.to_thread(db.collection('wage_ledgers').document(checkpoint['cursor']).get)
+        ledgers_query = ledgers_query.start_after(cursor_doc)
+
+    ledger_docs = paginate(ledgers_query, page_size)
+    payday_label = payday.strftime("%d %b %Y")
+    sent = checkpoint.get('sent', 0)
+    retry = []
+
+    # Ledgers whose reminder failed on an earlier run go first
+    retry_ids = checkpoint.get('retry') or []
+    for start in range(0, len(retry_ids), page_size):
+        retry_refs = [db.collection('wage_ledgers').document(ledger_id) for ledger_id in retry_ids[start:start + page_size]]
+        page = [doc for doc in await asyncio.to_thread(lambda: list(db.get_all(retry_refs))) if doc.exists]
+        page_sent, failed = await send_page(page, payday_label, dispatcher)
+        sent += page_sent
+        retry = _cap_retry(retry + failed, employer_id)
+
+    while page := await asyncio.to_thread(lambda: list(islice(ledger_docs, page_size))):
+        page_sent, failed = await send_page(page, payday_label, dispatcher)
+        sent += page_sent
+        retry = _cap_retry(retry + failed, employer_id)
+        if not dry_run:
+            await asyncio.to_thread(checkpoint_ref.set, {
+                "status": "running",
+                "cursor": page[-1].id,
+                "sent": sent,
+                "retry": retry,
+                "updatedAt": datetime.utcnow()
+            }, merge=True)
+
+    status = "incomplete" if retry else "done"
+    if not dry_run:
+        await asyncio.to_thread(checkpoint_ref.set, {
+            "status": status,
+            "sent": sent,
+            "retry": retry,
+            "finishedAt": datetime.utcnow()
+        }, merge=True)
+    return {"employer_id": employer_id, "status": status, "sent": sent, "retry": len(retry)}
+
+
+async def run_reminders(
+    payday: date,
+    concurrency: int = 50,
+    employer_concurrency: int = 4,
+    page_size: int = 500,
+    dry_run: bool = False
+) -> dict:
+    """Send reminders for everyone paid on `payday`, and finish earlier runs for paydays still ahead"""
+    month = datetime.utcnow().strftime("%Y-%m")
+    runs = firebase_service.db.collection('reminder_runs')
+
+    employer_docs = await asyncio.to_thread(employers_paid_on, payday)
+    carried_over = await asyncio.to_thread(unfinished_runs, datetime.utcnow().date(), payday)
+    logger.info(
+        f"Reminding workers of {len(employer_docs)} employers paid on {payday} ({month} ledgers), "
+        f"resuming {len(carried_over)} unfinished earlier runs"
+    )
+
+    dispatcher = ReminderDispatcher(concurrency, settings.notification_rate_limits_dict, dry_run=dry_run)
+    employers = asyncio.Semaphore(employer_concurrency)
+
+    async def run(employer_id: str, run_payday: date):
+        checkpoints = runs.document(run_payday.isoformat()).collection('employers')
+        async with employers:
+            try:
+                result = await remind_employer(
+                    employer_id, run_payday, month, dispatcher, checkpoints, page_size, dry_run
+                )
+            except Exception as e:
+                logger.error(f"Reminders failed for employer {employer_id} ({run_payday}): {e}")
+                result = {"employer_id": employer_id, "status": "failed", "error": str(e)}
+            return {**result, "payday": run_payday.isoformat()}
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            logger.info(f"Progress: {dispatcher.progress()}")
+
+    reporter = asyncio.create_task(report_progress())
+    try:
+        results = await asyncio.gather(
+            *(run(employer_id, run_payday) for run_payday, employer_id in carried_over),
+            *(run(doc.id, payday) for doc in employer_docs)
+        )
+    finally:
+        reporter.cancel()
+
+    summary = {
+        "payday": payday.isoformat(),
+        "month": month,
+        "employers": len(results),
+        "carried_over_employers": len(carried_over),
+        "skipped_employers": sum(1 for result in results if result["status"] == "skipped"),
+        "failed_employers": sum(1 for result in results if result["status"] == "failed"),
+        "incomplete_employers": sum(1 for result in results if result["status"] == "incomplete"),
+        **dispatcher.progress()
+    }
+    return {"summary": summary, "employers": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send payday reminders")
+    parser.add_argument("--date", default=None, help="Payday to remind about (YYYY-MM-DD)")
+    parser.add_argument("--days-ahead", type=int, default=1, help="Without --date, remind about the payday this many days from today")
+    parser.add_argument("--concurrency", type=int, default=50, help="Reminders in flight at once")
+    parser.add_argument("--employer-concurrency", type=int, default=4, help="Employers processed in parallel")
+    parser.add_argument("--page-size", type=int, default=500, help="Ledgers per query page")
+    parser.add_argument("--dry-run", action="store_true", help="Count reminders without sending or checkpointing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.date:
+        payday = datetime.strptime(args.date, "%Y-%m-%d").date()
+    else:
+        payday = datetime.utcnow().date() + timedelta(days=args.days_ahead)
+
+    report = asyncio.run(run_reminders(
+        payday,
+        concurrency=args.concurrency,
+        employer_concurrency=args.employer_concurrency,
+        page_size=args.page_size,
+        dry_run=args.dry_run
+    ))
+    print(json.dumps(report["summary"], indent=2))
+
+    if report["summary"]["failed_employers"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
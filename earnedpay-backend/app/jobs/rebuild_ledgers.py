@@ -0,0 +1,256 @@
+"""
+Rebuild wage ledgers for a month from attendance and withdrawals
+
+For each employer (in parallel), the month's attendance and withdrawals are
+streamed with paginated queries and summed per worker. `totalEarned`,
+`totalWithdrawn` and `availableBalance` are recomputed, diffed against the
+stored ledgers, and corrections are written one by one, each conditional on
+the ledger being unchanged since it was read; a ledger updated in between
+(by attendance or a withdrawal) is skipped and counted as a conflict.
+Missing ledgers are created only if nothing created them meanwhile. Settled
+ledgers are only reported unless --include-settled is given, since their
+settlement has already been paid.
+
+Usage:
+    python -m app.jobs.rebuild_ledgers --month YYYY-MM [--employer ID] [--include-settled] [--dry-run]
+"""
+from app.services.firebase_service import firebase_service
+from app.services.ledger_service import ledger_service
+from app.services.version_index import version_index
+from app.services.wage_calculator import wage_calculator
+from app.utils.document_keys import ledger_doc_id
+from app.utils.months import month_bounds
+from app.utils.pagination import paginate
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from google.api_core import exceptions as google_exceptions
+from typing import Optional
+import argparse
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tolerance for float sums of rupee amounts
+EPSILON = 0.005
+
+
+def rebuild_employer(
+    employer_doc,
+    month: str,
+    include_settled: bool = False,
+    dry_run: bool = False,
+    page_size: int = 500
+) -> dict:
+    """Recompute one employer's ledgers for a month and write corrections"""
+    db = firebase_service.db
+    employer_id = employer_doc.id
+    withdrawal_config = (employer_doc.to_dict() or {}).get('withdrawalConfig', {})
+    start, end = month_bounds(month)
+    stats = {
+        "employer_id": employer_id,
+        "attendance": 0,
+        "withdrawals": 0,
+        "ledgers": 0,
+        "mismatched": 0,
+        "created": 0,
+        "corrected": 0,
+        "settled_skipped": 0,
+        "conflicts": 0,
+        "diffs": []
+    }
+
+    # Ledgers are read first: any attendance or withdrawal written after this
+    # point changes the ledger's update time and fails its correction below
+    ledgers_query = db.collection('wage_ledgers') \
+        .where('employerId', '==', employer_id) \
+        .where('month', '==', month) \
+        .order_by('__name__')
+    ledgers = {doc.get('workerId'): doc for doc in paginate(ledgers_query, page_size)}
+    stats["ledgers"] = len(ledgers)
+
+    earned = {}
+    attendance_query = db.collection('attendance') \
+        .where('employerId', '==', employer_id) \
+        .where('date', '>=', start) \
+        .where('date', '<', end) \
+        .order_by('date') \
+        .select(['workerId', 'totalEarned'])
+    for doc in paginate(attendance_query, page_size):
+        stats["attendance"] += 1
+        worker_id = doc.get('workerId')
+        earned[worker_id] = earned.get(worker_id, 0.0) + (doc.get('totalEarned') or 0.0)
+
+    withdrawn = {}
+    withdrawals_query = db.collection('withdrawals') \
+        .where('employerId', '==', employer_id) \
+        .where('requestedAt', '>=', start) \
+        .where('requestedAt', '<', end) \
+        .order_by('requestedAt') \
+        .select(['workerId', 'ledgerId', 'amount', 'status'])
+    for doc in paginate(withdrawals_query, page_size):
+        stats["withdrawals"] += 1
+        if doc.get('status') != 'completed':
+            continue
+        worker_id = doc.get('workerId')
+        withdrawn[worker_id] = withdrawn.get(worker_id, 0.0) + (doc.get('amount') or 0.0)
+
+    worker_ids = sorted(set(ledgers) | set(earned) | set(withdrawn))
+    expected_ledgers = [
+        {"totalEarned": earned.get(worker_id, 0.0), "totalWithdrawn": withdrawn.get(worker_id, 0.0)}
+        for worker_id in worker_ids
+    ]
+    balances = wage_calculator.calculate_available_balances(
+        expected_ledgers, withdrawal_config.get('maxPercentage', 40)
+    )
+
+    # Totals are absolute values computed from the reads above, so every
+    # write is conditional: a ledger that moved since is left for the next run
+    touched = []
+    for worker_id, balance in zip(worker_ids, balances):
+        expected = {
+            "totalEarned": balance['total_earned'],
+            "totalWithdrawn": balance['total_withdrawn'],
+            "availableBalance": balance['available_to_withdraw']
+        }
+        ledger_doc = ledgers.get(worker_id)
+
+        if ledger_doc is None:
+            stats["mismatched"] += 1
+            stats["diffs"].append({"worker_id": worker_id, "missing": True, "expected": expected})
+            if not dry_run:
+                ledger_data = ledger_service.build_ledger(
+                    worker_id, employer_id, month, withdrawal_config.get('paydayDate', 1), reference=start
+                )
+                try:
+                    ledger_service.ledger_ref(worker_id, month).create({**ledger_data, **expected})
+                except google_exceptions.AlreadyExists:
+                    logger.warning(f"Ledger {ledger_doc_id(worker_id, month)} was created during the rebuild; skipping")
+                    stats["conflicts"] += 1
+                    continue
+                touched.append(ledger_doc_id(worker_id, month))
+            stats["created"] += 1
+            continue
+
+        stored = ledger_doc.to_dict()
+        changed = {
+            field: {"stored": stored.get(field, 0.0), "expected": value}
+            for field, value in expected.items()
+            if abs((stored.get(field) or 0.0) - value) > EPSILON
+        }
+        if not changed:
+            continue
+
+        stats["mismatched"] += 1
+        stats["diffs"].append({
+            "worker_id": worker_id,
+            "ledger_id": ledger_doc.id,
+            "status": stored.get('status'),
+            "fields": changed
+        })
+        if stored.get('status') == 'settled' and not include_settled:
+            stats["settled_skipped"] += 1
+            continue
+
+        if not dry_run:
+            try:
+                ledger_doc.reference.update({
+                    **{field: expected[field] for field in changed},
+                    "rebuiltAt": datetime.utcnow(),
+                    "updatedAt": datetime.utcnow()
+                }, option=db.write_option(last_update_time=ledger_doc.update_time))
+            except google_exceptions.FailedPrecondition:
+                logger.warning(f"Ledger {ledger_doc.id} changed since it was read; skipping correction")
+                stats["conflicts"] += 1
+                continue
+            touched.append(ledger_doc.id)
+        stats["corrected"] += 1
+
+    if not dry_run:
+        for ledger_id in touched:
+            version_index.touch(f"wage_ledgers/{ledger_id}")
+    return stats
+
+
+def run_rebuild(
+    month: str,
+    employer_id: Optional[str] = None,
+    concurrency: int = 8,
+    include_settled: bool = False,
+    dry_run: bool = False,
+    page_size: int = 500
+) -> dict:
+    """Rebuild `month` ledgers for one or all employers"""
+    start_time = time.perf_counter()
+    employers = firebase_service.db.collection('employers')
+    if employer_id:
+        employer_docs = [doc for doc in [employers.document(employer_id).get()] if doc.exists]
+    else:
+        employer_docs = list(employers.stream())
+
+    results = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(rebuild_employer, doc, month, include_settled, dry_run, page_size): doc.id
+            for doc in employer_docs
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Rebuild failed for employer {futures[future]}: {e}")
+                failed += 1
+
+    elapsed = time.perf_counter() - start_time
+    documents = sum(result["attendance"] + result["withdrawals"] + result["ledgers"] for result in results)
+    summary = {
+        "month": month,
+        "dry_run": dry_run,
+        "employers": len(results),
+        "failed_employers": failed,
+        **{
+            name: sum(result[name] for result in results)
+            for name in ("attendance", "withdrawals", "ledgers", "mismatched", "created", "corrected", "settled_skipped", "conflicts")
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "documents_per_second": round(documents / elapsed, 1) if elapsed else 0.0
+    }
+    diffs = [
+        {"employer_id": result["employer_id"], **diff}
+        for result in results for diff in result["diffs"]
+    ]
+    return {"summary": summary, "diffs": diffs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild wage ledgers from attendance and withdrawals")
+    parser.add_argument("--month", required=True, help="Month to rebuild (YYYY-MM)")
+    parser.add_argument("--employer", default=None, help="Only rebuild this employer")
+    parser.add_argument("--concurrency", type=int, default=8, help="Employers processed in parallel")
+    parser.add_argument("--include-settled", action="store_true", help="Also correct settled ledgers")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents per query page")
+    parser.add_argument("--dry-run", action="store_true", help="Report differences without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    datetime.strptime(args.month, "%Y-%m")
+    report = run_rebuild(
+        args.month,
+        employer_id=args.employer,
+        concurrency=args.concurrency,
+        include_settled=args.include_settled,
+        dry_run=args.dry_run,
+        page_size=args.page_size
+    )
+    print(json.dumps(report, indent=2, default=str))
+    logger.info(f"Rebuild for {args.month}{' (dry run)' if args.dry_run else ''}: {report['summary']}")
+
+    if report["summary"]["failed_employers"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
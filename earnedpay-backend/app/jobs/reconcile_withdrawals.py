@@ -0,0 +1,278 @@
+"""
+Reconcile withdrawals, wage ledgers and UPI payouts for a month
+
+For each employer, ledgers and the month's withdrawals are streamed with
+paginated queries. Withdrawals left in `pending`/`processing`/`unknown`
+(by a crash or a gateway timeout in request_withdrawal) are resolved
+against the payout gateway with bounded concurrency, and each ledger's
+`totalWithdrawn` is compared with the sum of its completed withdrawals.
+With --fix, resolved withdrawals and mismatched ledgers are corrected, each
+only if the document is unchanged since it was read. Scheduled every 15
+minutes with --fix, since workers cannot withdraw while a payout is
+unresolved.
+
+Usage:
+    python -m app.jobs.reconcile_withdrawals [--month YYYY-MM] [--fix] [--concurrency N] [--gateway-concurrency N]
+"""
+from app.models.withdrawal import UNRESOLVED_WITHDRAWAL_STATES
+from app.services.firebase_service import firebase_service
+from app.services.upi_service import upi_service
+from app.services.version_index import version_index
+from app.services.wage_calculator import wage_calculator
+from app.utils.months import month_bounds
+from app.utils.pagination import paginate
+from datetime import datetime, timedelta, timezone
+from google.api_core import exceptions as google_exceptions
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED_STATES = set(UNRESOLVED_WITHDRAWAL_STATES)
+
+# Leave in-flight withdrawals alone; only rows older than this are stuck
+STUCK_AFTER = timedelta(minutes=15)
+
+# Tolerance for float sums of rupee amounts
+EPSILON = 0.005
+
+
+def _load_employer_month(employer_id: str, month: str, page_size: int) -> tuple[dict, list]:
+    """Stream an employer's ledgers and withdrawals for a month"""
+    db = firebase_service.db
+    start, end = month_bounds(month)
+
+    ledgers_query = db.collection('wage_ledgers') \
+        .where('employerId', '==', employer_id) \
+        .where('month', '==', month) \
+        .order_by('__name__')
+    ledgers = {doc.id: doc for doc in paginate(ledgers_query, page_size)}
+
+    withdrawals_query = db.collection('withdrawals') \
+        .where('employerId', '==', employer_id) \
+        .where('requestedAt', '>=', start) \
+        .where('requestedAt', '<', end) \
+        .order_by('requestedAt')
+    withdrawals = list(paginate(withdrawals_query, page_size))
+
+    return ledgers, withdrawals
+
+
+def apply_corrections(updates: list) -> tuple[list, int]:
+    """
+    Apply (ref, update, read update_time) corrections one by one
+
+    Each write is conditional on the document being unchanged since it was
+    read, so a withdrawal or attendance write landing in between is never
+    overwritten; changed documents are skipped and left for the next run.
+
+    Returns:
+        (refs updated, number skipped because the document changed)
+    """
+    db = firebase_service.db
+    applied = []
+    conflicts = 0
+    for ref, update, update_time in updates:
+        try:
+            ref.update(update, option=db.write_option(last_update_time=update_time))
+        except google_exceptions.FailedPrecondition:
+            logger.warning(f"{ref.path} changed since it was read; skipping correction")
+            conflicts += 1
+            continue
+        applied.append(ref)
+    return applied, conflicts
+
+
+async def _resolve(withdrawal_doc, gateway: asyncio.Semaphore) -> dict:
+    """Ask the gateway what happened to an unresolved withdrawal"""
+    data = withdrawal_doc.to_dict()
+    async with gateway:
+        try:
+            result = await upi_service.check_status(data.get('transactionId') or withdrawal_doc.id)
+        except Exception as e:
+            return {"status": "unknown", "message": str(e)}
+    return result
+
+
+async def reconcile_employer(
+    employer_doc,
+    month: str,
+    gateway: asyncio.Semaphore,
+    fix: bool,
+    page_size: int
+) -> dict:
+    """Reconcile one employer-month"""
+    employer_id = employer_doc.id
+    max_percentage = (employer_doc.to_dict() or {}).get('withdrawalConfig', {}).get('maxPercentage', 40)
+    ledgers, withdrawals = await asyncio.to_thread(_load_employer_month, employer_id, month, page_size)
+
+    now = datetime.now(timezone.utc)
+    discrepancies = []
+    completed_by_ledger = {}
+    withdrawal_updates = []
+
+    stuck = [
+        doc for doc in withdrawals
+        if doc.get('status') in UNRESOLVED_STATES
+        and doc.get('requestedAt') is not None
+        and now - doc.get('requestedAt').replace(tzinfo=timezone.utc) > STUCK_AFTER
+    ]
+    resolutions = await asyncio.gather(*(_resolve(doc, gateway) for doc in stuck))
+    resolved = {doc.id: resolution for doc, resolution in zip(stuck, resolutions)}
+
+    for doc in withdrawals:
+        data = doc.to_dict()
+        status = data.get('status')
+
+        if doc.id in resolved:
+            gateway_status = resolved[doc.id].get('status')
+            discrepancies.append({
+                "type": "unresolved_withdrawal",
+                "withdrawal_id": doc.id,
+                "worker_id": data.get('workerId'),
+                "amount": data.get('amount'),
+                "status": status,
+                "gateway_status": gateway_status
+            })
+            if gateway_status in ("completed", "failed"):
+                update = {"status": gateway_status, "reconciledAt": datetime.utcnow(), "updatedAt": datetime.utcnow()}
+                if gateway_status == "completed":
+                    update["completedAt"] = datetime.utcnow()
+                    update["transactionId"] = resolved[doc.id].get('transaction_id') or data.get('transactionId')
+                else:
+                    update["failureReason"] = resolved[doc.id].get('message', 'Payout failed')
+                withdrawal_updates.append((doc.reference, update, doc.update_time))
+                status = gateway_status
+
+        if status != "completed":
+            continue
+
+        ledger_id = data.get('ledgerId')
+        if ledger_id not in ledgers:
+            discrepancies.append({
+                "type": "orphan_withdrawal",
+                "withdrawal_id": doc.id,
+                "ledger_id": ledger_id,
+                "amount": data.get('amount')
+            })
+            continue
+        completed_by_ledger[ledger_id] = completed_by_ledger.get(ledger_id, 0.0) + data.get('amount', 0.0)
+
+    ledger_updates = []
+    for ledger_id, ledger_doc in ledgers.items():
+        ledger_data = ledger_doc.to_dict()
+        recorded = ledger_data.get('totalWithdrawn', 0.0)
+        expected = round(completed_by_ledger.get(ledger_id, 0.0), 2)
+        if abs(recorded - expected) <= EPSILON:
+            continue
+
+        discrepancies.append({
+            "type": "ledger_mismatch",
+            "ledger_id": ledger_id,
+            "worker_id": ledger_data.get('workerId'),
+            "recorded_total_withdrawn": recorded,
+            "completed_withdrawals": expected
+        })
+        balance_info = wage_calculator.calculate_available_balance(
+            total_earned=ledger_data.get('totalEarned', 0.0),
+            total_withdrawn=expected,
+            max_percentage=max_percentage
+        )
+        ledger_updates.append((ledger_doc.reference, {
+            "totalWithdrawn": expected,
+            "availableBalance": balance_info['available_to_withdraw'],
+            "reconciledAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
+        }, ledger_doc.update_time))
+
+    applied = []
+    conflicts = 0
+    if fix and (withdrawal_updates or ledger_updates):
+        applied, conflicts = await asyncio.to_thread(apply_corrections, withdrawal_updates + ledger_updates)
+        for ref in applied:
+            if ref.parent.id == 'wage_ledgers':
+                version_index.touch(f"wage_ledgers/{ref.id}")
+
+    return {
+        "employer_id": employer_id,
+        "ledgers": len(ledgers),
+        "withdrawals": len(withdrawals),
+        "fixed": len(applied),
+        "conflicts": conflicts,
+        "discrepancies": discrepancies
+    }
+
+
+async def run_reconciliation(
+    month: str,
+    fix: bool = False,
+    concurrency: int = 8,
+    gateway_concurrency: int = 10,
+    page_size: int = 500
+) -> dict:
+    """Reconcile every employer for `month`"""
+    start_time = time.perf_counter()
+    employer_docs = await asyncio.to_thread(lambda: list(firebase_service.db.collection('employers').stream()))
+
+    gateway = asyncio.Semaphore(gateway_concurrency)
+    employers = asyncio.Semaphore(concurrency)
+
+    async def run(employer_doc):
+        async with employers:
+            try:
+                return await reconcile_employer(employer_doc, month, gateway, fix, page_size)
+            except Exception as e:
+                logger.error(f"Reconciliation failed for employer {employer_doc.id}: {e}")
+                return {"employer_id": employer_doc.id, "error": str(e), "discrepancies": []}
+
+    results = await asyncio.gather(*(run(doc) for doc in employer_docs))
+
+    elapsed = time.perf_counter() - start_time
+    withdrawals = sum(result.get("withdrawals", 0) for result in results)
+    discrepancies = [
+        {"employer_id": result["employer_id"], **item}
+        for result in results for item in result["discrepancies"]
+    ]
+    summary = {
+        "month": month,
+        "employers": len(results),
+        "failed_employers": sum(1 for result in results if "error" in result),
+        "ledgers": sum(result.get("ledgers", 0) for result in results),
+        "withdrawals": withdrawals,
+        "discrepancies": len(discrepancies),
+        "fixed": sum(result.get("fixed", 0) for result in results),
+        "conflicts": sum(result.get("conflicts", 0) for result in results),
+        "elapsed_seconds": round(elapsed, 2),
+        "withdrawals_per_second": round(withdrawals / elapsed, 1) if elapsed else 0.0
+    }
+    return {"summary": summary, "discrepancies": discrepancies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile withdrawals, ledgers and payouts")
+    parser.add_argument("--month", default=None, help="Month to reconcile (YYYY-MM), defaults to current month")
+    parser.add_argument("--fix", action="store_true", help="Apply corrections")
+    parser.add_argument("--concurrency", type=int, default=8, help="Employers reconciled in parallel")
+    parser.add_argument("--gateway-concurrency", type=int, default=10, help="Concurrent payout status checks")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents per query page")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    month = args.month or datetime.utcnow().strftime("%Y-%m")
+    report = asyncio.run(run_reconciliation(
+        month,
+        fix=args.fix,
+        concurrency=args.concurrency,
+        gateway_concurrency=args.gateway_concurrency,
+        page_size=args.page_size
+    ))
+    print(json.dumps(report, indent=2, default=str))
+    logger.info(f"Reconciliation for {month}: {report['summary']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Settle every employer for a month in one run
+
+Employers are settled in parallel on a bounded thread pool (each thread
+holds at most a few Firestore requests in flight). Progress is checkpointed
+per employer under `settlement_runs/{month}/employers/{employerId}`, so an
+interrupted run can be resumed and will skip employers already settled.
+
+Usage:
+    python -m app.jobs.settle_month --month YYYY-MM [--concurrency N] [--retry-failed]
+"""
+from app.services.firebase_service import firebase_service
+from app.services.settlement_service import settlement_service, NoActiveLedgersError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import argparse
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint states that are not retried on resume
+FINAL_STATES = {"settled", "nothing_to_settle"}
+
+
+def settle_employer(employer_id: str, month: str, checkpoints) -> dict:
+    """Settle one employer and record the outcome"""
+    start_time = time.perf_counter()
+    checkpoint_ref = checkpoints.document(employer_id)
+    checkpoint_ref.set({"status": "running", "startedAt": datetime.utcnow()})
+
+    try:
+        result = settlement_service.process_settlement(employer_id, month)
+        outcome = {"status": "settled", **result}
+    except NoActiveLedgersError:
+        outcome = {"status": "nothing_to_settle"}
+    except Exception as e:
+        logger.error(f"Settlement failed for employer {employer_id}: {e}")
+        outcome = {"status": "failed", "error": str(e)}
+
+    outcome["seconds"] = round(time.perf_counter() - start_time, 3)
+    checkpoint_ref.set({**outcome, "finishedAt": datetime.utcnow()}, merge=True)
+    return {"employer_id": employer_id, **outcome}
+
+
+def run_settlement(month: str, concurrency: int = 4, retry_failed: bool = False) -> dict:
+    """Settle all employers for `month`, skipping those already checkpointed"""
+    db = firebase_service.db
+    run_ref = db.collection('settlement_runs').document(month)
+    checkpoints = run_ref.collection('employers')
+
+    done = {
+        doc.id for doc in checkpoints.stream()
+        if doc.get('status') in FINAL_STATES or (doc.get('status') == 'failed' and not retry_failed)
+    }
+    employer_ids = [doc.id for doc in db.collection('employers').select([]).stream() if doc.id not in done]
+    logger.info(f"Settling {len(employer_ids)} employers for {month} ({len(done)} already checkpointed)")
+
+    start_time = time.perf_counter()
+    run_ref.set({"month": month, "startedAt": datetime.utcnow(), "status": "running"}, merge=True)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(settle_employer, employer_id, month, checkpoints) for employer_id in employer_ids]
+        for count, future in enumerate(as_completed(futures), start=1):
+            results.append(future.result())
+            if count % 50 == 0:
+                logger.info(f"{count}/{len(employer_ids)} employers processed")
+
+    settled = [result for result in results if result["status"] == "settled"]
+    summary = {
+        "month": month,
+        "employers_processed": len(results),
+        "employers_skipped": len(done),
+        "settled": len(settled),
+        "nothing_to_settle": sum(1 for result in results if result["status"] == "nothing_to_settle"),
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "workers": sum(result["workers_count"] for result in settled),
+        "total_earnings": round(sum(result["total_earnings"] for result in settled), 2),
+        "total_withdrawals": round(sum(result["total_withdrawals"] for result in settled), 2),
+        "net_settlement": round(sum(result["net_settlement"] for result in settled), 2),
+        "elapsed_seconds": round(time.perf_counter() - start_time, 2),
+        "slowest_employers": sorted(
+            ({"employer_id": result["employer_id"], "seconds": result["seconds"]} for result in results),
+            key=lambda timing: timing["seconds"],
+            reverse=True
+        )[:10]
+    }
+
+    run_ref.set({
+        "status": "failed" if summary["failed"] else "completed",
+        "finishedAt": datetime.utcnow(),
+        "summary": summary
+    }, merge=True)
+    return {"summary": summary, "employers": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Settle all employers for a month")
+    parser.add_argument("--month", required=True, help="Month to settle (YYYY-MM)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Employers settled in parallel")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry employers whose last attempt failed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    datetime.strptime(args.month, "%Y-%m")
+    report = run_settlement(args.month, concurrency=args.concurrency, retry_failed=args.retry_failed)
+    print(json.dumps(report, indent=2, default=str))
+
+    if report["summary"]["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
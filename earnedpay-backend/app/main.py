@@ -3,6 +3,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.config import settings
 from app.routers import auth, workers, employers, settlements
+from app.services.cache_service import cache_service
+from app.services.load_shedder import load_shedder
+from app.services.read_policy import read_policy, DatastoreUnavailableError
+from app.services.upi_service import upi_service
 import logging
 import time
 
@@ -23,14 +27,22 @@ app = FastAPI(
     redoc_url="/redoc" if settings.debug else None
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.allowed_origins_list,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Load shedding middleware (registered first so log_requests also logs shed requests)
+@app.middleware("http")
+async def shed_load(request: Request, call_next):
+    retry_after = load_shedder.admit(request.method, request.url.path)
+    
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Server is busy. Please try again shortly."},
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    try:
+        return await call_next(request)
+    finally:
+        load_shedder.release()
 
 
 # Request logging middleware
@@ -54,7 +66,29 @@ async def log_requests(request: Request, call_next):
     return response
 
 
-# Exception handler
+# CORS middleware (registered last so it is outermost and shed 503s
+# still carry CORS headers)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.allowed_origins_list,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
+)
+
+
+# Exception handlers
+@app.exception_handler(DatastoreUnavailableError)
+async def datastore_unavailable_handler(request: Request, exc: DatastoreUnavailableError):
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable. Please try again shortly."},
+        headers={"Retry-After": "1"}
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
@@ -71,10 +105,15 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    # An open payout circuit degrades withdrawals but the API stays up
     return {
-        "status": "healthy",
+        "status": "healthy" if upi_service.available else "degraded",
         "environment": settings.environment,
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "cache": cache_service.stats(),
+        "load": load_shedder.stats(),
+        "reads": read_policy.stats(),
+        "payouts": upi_service.breaker.stats()
     }
 
 
@@ -100,6 +139,7 @@ app.include_router(settlements.router)
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting EarnedPay API...")
+    load_shedder.start()
     logger.info(f"Environment: {settings.environment}")
     logger.info(f"Debug mode: {settings.debug}")
     logger.info(f"Allowed origins: {settings.allowed_origins_list}")
@@ -109,6 +149,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down EarnedPay API...")
+    load_shedder.stop()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
+from app.models.user import BankAccount
 
 
 class EmployerBase(BaseModel):
@@ -34,10 +35,17 @@ class EmployerDashboard(BaseModel):
 
 class AttendanceEntry(BaseModel):
     worker_id: str
-    date: str  # YYYY-MM-DD
+    date: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}$")  # YYYY-MM-DD
     hours_worked: float = Field(..., ge=0, le=24)
     wage_per_hour: float = Field(..., ge=0)
     status: str = Field(default="present")
+    
+    @field_validator('date')
+    @classmethod
+    def date_must_exist(cls, value: str) -> str:
+        # The string is used as-is in document IDs, so it must be canonical
+        datetime.strptime(value, "%Y-%m-%d")
+        return value
 
 
 
@@ -50,4 +58,5 @@ class EmployerUpdate(BaseModel):
     phone_number: Optional[str] = None
     gst_number: Optional[str] = None
     withdrawal_config: Optional[dict] = None
+    bank_account: Optional[BankAccount] = None  # debit account for bulk payment files
 
@@ -31,9 +31,9 @@ class User(UserBase):
 
 
 class BankAccount(BaseModel):
-    account_number: str
-    ifsc: str
-    account_holder_name: str
+    account_number: str = Field(..., pattern=r"^\d{9,18}$")
+    ifsc: str = Field(..., pattern=r"^[A-Z]{4}0[A-Z0-9]{6}$")
+    account_holder_name: str = Field(..., min_length=1, max_length=100)
 
 
 class WithdrawalConfig(BaseModel):
@@ -2,6 +2,10 @@ from pydantic import BaseModel, Field
 from typing import Optional, Literal
 from datetime import datetime
 
+# Withdrawals whose payout may or may not have happened yet ("unknown": the
+# gateway call timed out); reconcile_withdrawals resolves them
+UNRESOLVED_WITHDRAWAL_STATES = ["pending", "processing", "unknown"]
+
 
 class WithdrawalRequest(BaseModel):
     amount: float = Field(..., gt=0)
@@ -14,7 +18,7 @@ class Withdrawal(BaseModel):
     employer_id: str
     amount: float
     upi_id: str
-    status: Literal["pending", "processing", "completed", "failed"]
+    status: Literal["pending", "processing", "unknown", "completed", "failed"]
     requested_at: datetime
     completed_at: Optional[datetime] = None
     transaction_id: Optional[str] = None
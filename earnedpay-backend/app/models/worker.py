@@ -1,7 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Literal
 from datetime import datetime
 
+UPI_ID_PATTERN = r"^[\w.-]+@[\w.-]+$"
+MAX_BULK_IMPORT_ROWS = 5000
+
 
 class WorkerBase(BaseModel):
     full_name: str
@@ -36,8 +39,33 @@ class WorkerBalance(BaseModel):
 
 
 class UpdateUPI(BaseModel):
-    upi_id: str = Field(..., pattern=r"^[\w.-]+@[\w.-]+$")
+    upi_id: str = Field(..., pattern=UPI_ID_PATTERN)
 
 
 class UpdatePassword(BaseModel):
     password: str = Field(..., min_length=4)
+
+
+class WorkerImportRow(WorkerBase):
+    """One row of a bulk import; stricter than WorkerCreate on UPI format"""
+    upi_id: str = Field(..., pattern=UPI_ID_PATTERN)
+
+
+class BulkWorkerImport(BaseModel):
+    workers: List[dict] = Field(..., max_length=MAX_BULK_IMPORT_ROWS)
+    send_invites: bool = True
+
+
+class BulkImportRowResult(BaseModel):
+    row: int
+    status: Literal["created", "skipped", "failed"]
+    worker_id: Optional[str] = None
+    phone_number: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class BulkImportReport(BaseModel):
+    created: int
+    skipped: int
+    failed: int
+    rows: List[BulkImportRowResult]
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from app.dependencies import get_current_user
 from app.services.firebase_service import firebase_service
+from app.services.id_allocator import next_custom_id
 from datetime import datetime
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -29,12 +31,9 @@ async def verify_token(
         phone_number = decoded_token.get("phone_number", "")
         email = decoded_token.get("email", "")
         
-        import random
-        import string
-        
-        # Generate Custom ID (EP-XXXX)
-        random_suffix = ''.join(random.choices(string.digits, k=4))
-        custom_id = f"EP-{random_suffix}"
+        # Unique sequential Custom ID from this process's reserved block; a
+        # new block is a blocking Firestore transaction, so it runs off the loop
+        custom_id = await run_in_threadpool(next_custom_id)
         
         new_user_data = {
             "phoneNumber": phone_number,
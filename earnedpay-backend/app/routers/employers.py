@@ -1,10 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.dependencies import get_current_user
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.dependencies import get_current_employer, get_profile_doc
 from app.models.employer import EmployerDashboard, AttendanceSubmit, EmployerUpdate
-from app.models.worker import WorkerCreate
+from app.models.worker import WorkerCreate, BulkWorkerImport, BulkImportReport, MAX_BULK_IMPORT_ROWS
+from app.services.archive_service import archive_service
 from app.services.firebase_service import firebase_service
 from app.services.wage_calculator import wage_calculator
-from datetime import datetime
+from app.services.ledger_service import ledger_service
+from app.services.onboarding_service import onboarding_service
+from app.services.attendance_analytics import attendance_analytics
+from app.services.roster_service import roster_service
+from app.services.version_index import version_index
+from app.utils.document_keys import attendance_doc_id
+from app.utils.etag import make_etag, is_not_modified, not_modified
+from app.utils.pagination import paginate
+from datetime import date, datetime
+from google.api_core import exceptions as google_exceptions
+from itertools import islice
+from typing import Optional
+import csv
+import json
 import uuid
 import logging
 
@@ -13,16 +29,20 @@ router = APIRouter(prefix="/api/employers", tags=["Employers"])
 
 
 @router.get("/me")
-async def get_employer_profile(current_user: dict = Depends(get_current_user)):
+async def get_employer_profile(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_employer)
+):
     """Get current employer profile"""
-    if current_user.get("role") != "employer":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
-        )
+    resource = f"employers/{current_user['uid']}"
+    
+    # Answer revalidation from the version index without reading the document
+    version = version_index.get(resource)
+    if version and is_not_modified(request, make_etag(resource, version)):
+        return not_modified(make_etag(resource, version))
     
-    employer_ref = firebase_service.db.collection('employers').document(current_user["uid"])
-    employer_doc = employer_ref.get()
+    employer_doc = await get_profile_doc(request, current_user)
     
     if not employer_doc.exists:
         raise HTTPException(
@@ -30,23 +50,22 @@ async def get_employer_profile(current_user: dict = Depends(get_current_user)):
             detail="Employer profile not found"
         )
     
+    etag = make_etag(resource, version_index.record_snapshot(resource, employer_doc))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    response.headers["ETag"] = etag
     return {"id": current_user["uid"], **employer_doc.to_dict()}
 
 
 @router.put("/me")
 async def update_employer_profile(
+    request: Request,
     update_data: EmployerUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_employer)
 ):
     """Update employer profile and settings"""
-    if current_user.get("role") != "employer":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
-        )
-    
-    employer_ref = firebase_service.db.collection('employers').document(current_user["uid"])
-    employer_doc = employer_ref.get()
+    employer_doc = await get_profile_doc(request, current_user)
     
     if not employer_doc.exists:
         raise HTTPException(
@@ -68,24 +87,26 @@ async def update_employer_profile(
         firestore_update['gstNumber'] = update_dict['gst_number']
     if 'withdrawal_config' in update_dict:
         firestore_update['withdrawalConfig'] = update_dict['withdrawal_config']
+    if 'bank_account' in update_dict:
+        firestore_update['bankAccount'] = {
+            'accountNumber': update_data.bank_account.account_number,
+            'ifsc': update_data.bank_account.ifsc,
+            'accountHolderName': update_data.bank_account.account_holder_name
+        }
         
     if firestore_update:
         firestore_update['updatedAt'] = datetime.utcnow()
-        employer_ref.update(firestore_update)
+        employer_doc.reference.update(firestore_update)
+        firebase_service.invalidate_employer(current_user["uid"])
+        version_index.touch(f"employers/{current_user['uid']}")
         
     return {"success": True, "message": "Profile updated successfully"}
 
 
 
 @router.get("/me/workers")
-async def list_workers(current_user: dict = Depends(get_current_user)):
+async def list_workers(current_user: dict = Depends(get_current_employer)):
     """List all workers under this employer"""
-    if current_user.get("role") != "employer":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
-        )
-    
     employer_id = current_user["uid"]
     
     workers_query = firebase_service.db.collection('workers') \
@@ -103,24 +124,78 @@ async def list_workers(current_user: dict = Depends(get_current_user)):
     return {"workers": workers}
 
 
+# Ledgers read (and worker names fetched) per round trip
+BALANCES_PAGE_SIZE = 500
+
+
+def _stream_worker_balances(employer_id: str, month: str, withdrawal_config: dict):
+    """Encode every worker's balance for the month as one JSON document, a page at a time"""
+    db = firebase_service.db
+    max_percentage = withdrawal_config.get('maxPercentage', 40)
+    next_payday = wage_calculator.get_next_payday(withdrawal_config.get('paydayDate', 1))
+    
+    ledgers_query = db.collection('wage_ledgers') \
+        .where('employerId', '==', employer_id) \
+        .where('month', '==', month) \
+        .order_by('__name__')
+    ledger_docs = paginate(ledgers_query, BALANCES_PAGE_SIZE)
+    
+    yield (
+        f'{{"month": {json.dumps(month)}, "next_payday": {json.dumps(next_payday.isoformat())}, '
+        f'"max_percentage": {json.dumps(max_percentage)}, "balances": ['
+    ).encode("utf-8")
+    
+    first = True
+    while page := list(islice(ledger_docs, BALANCES_PAGE_SIZE)):
+        ledgers = [doc.to_dict() for doc in page]
+        worker_refs = [db.collection('workers').document(ledger['workerId']) for ledger in ledgers]
+        worker_names = {
+            doc.id: doc.get('fullName')
+            for doc in db.get_all(worker_refs, field_paths=['fullName'])
+            if doc.exists
+        }
+        
+        rows = []
+        for ledger, balance in zip(ledgers, wage_calculator.calculate_available_balances(ledgers, max_percentage)):
+            rows.append(json.dumps({
+                "worker_id": ledger['workerId'],
+                "worker_name": worker_names.get(ledger['workerId']),
+                "status": ledger.get('status'),
+                **balance
+            }))
+        
+        yield (("" if first else ",") + ",".join(rows)).encode("utf-8")
+        first = False
+    
+    yield b"]}"
+
+
+@router.get("/me/workers/balances")
+async def get_worker_balances(
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    current_user: dict = Depends(get_current_employer)
+):
+    """Every worker's balance for a month (default: current), streamed"""
+    employer_id = current_user["uid"]
+    month = month or datetime.utcnow().strftime("%Y-%m")
+    withdrawal_config = (await firebase_service.get_employer(employer_id) or {}).get('withdrawalConfig', {})
+    
+    return StreamingResponse(
+        _stream_worker_balances(employer_id, month, withdrawal_config),
+        media_type="application/json"
+    )
+
+
 @router.post("/me/workers")
 async def add_worker(
     worker_data: WorkerCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_employer)
 ):
     """Add a new worker"""
-    if current_user.get("role") != "employer":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
-        )
-    
     employer_id = current_user["uid"]
     
     # Get employer config
-    employer_ref = firebase_service.db.collection('employers').document(employer_id)
-    employer_doc = employer_ref.get()
-    employer_data = employer_doc.to_dict() if employer_doc.exists else {}
+    employer_data = await firebase_service.get_employer(employer_id) or {}
     withdrawal_config = employer_data.get('withdrawalConfig', {})
     payday_date = withdrawal_config.get('paydayDate', 1)
     
@@ -145,22 +220,9 @@ async def add_worker(
     
     # Create initial wage ledger for current month
     current_month = datetime.utcnow().strftime("%Y-%m")
-    ledger_id = str(uuid.uuid4())
-    ledger_data = {
-        "workerId": worker_id,
-        "employerId": employer_id,
-        "month": current_month,
-        "totalEarned": 0.0,
-        "totalWithdrawn": 0.0,
-        "availableBalance": 0.0,
-        "paydayDate": wage_calculator.get_next_payday(payday_date),
-        "status": "active",
-        "createdAt": datetime.utcnow(),
-        "updatedAt": datetime.utcnow()
-    }
-    
-    ledger_ref = firebase_service.db.collection('wage_ledgers').document(ledger_id)
-    ledger_ref.set(ledger_data)
+    ledger_data = ledger_service.build_ledger(worker_id, employer_id, current_month, payday_date)
+    ledger_service.ledger_ref(worker_id, current_month).set(ledger_data)
+    roster_service.invalidate(employer_id)
     
     return {
         "success": True,
@@ -169,15 +231,98 @@ async def add_worker(
     }
 
 
-@router.get("/me/dashboard", response_model=EmployerDashboard)
-async def get_employer_dashboard(current_user: dict = Depends(get_current_user)):
-    """Get employer dashboard statistics"""
-    if current_user.get("role") != "employer":
+@router.post("/me/workers/bulk", response_model=BulkImportReport)
+async def bulk_add_workers(
+    import_data: BulkWorkerImport,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_employer)
+):
+    """Add many workers at once from a JSON list of rows"""
+    return await _bulk_onboard(current_user["uid"], import_data.workers, import_data.send_invites, background_tasks)
+
+
+@router.post("/me/workers/bulk/csv", response_model=BulkImportReport)
+async def bulk_add_workers_csv(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    send_invites: bool = True,
+    current_user: dict = Depends(get_current_employer)
+):
+    """Add many workers at once from a CSV upload (full_name, phone_number, upi_id columns)"""
+    try:
+        rows = onboarding_service.parse_csv((await file.read()).decode("utf-8"))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not read CSV file: {e}"
+        )
+    
+    if len(rows) > MAX_BULK_IMPORT_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_IMPORT_ROWS} rows can be imported at once"
+        )
+    
+    return await _bulk_onboard(current_user["uid"], rows, send_invites, background_tasks)
+
+
+async def _bulk_onboard(
+    employer_id: str,
+    rows: list[dict],
+    send_invites: bool,
+    background_tasks: BackgroundTasks
+) -> BulkImportReport:
+    """Create workers and queue their invitations"""
+    employer_data = await firebase_service.get_employer(employer_id) or {}
+    
+    # Thousands of rows of blocking Firestore calls run off the event loop
+    report, created = await run_in_threadpool(onboarding_service.import_workers, employer_id, employer_data, rows)
+    if created:
+        roster_service.invalidate(employer_id)
+    
+    if send_invites and created:
+        background_tasks.add_task(
+            onboarding_service.send_invites,
+            employer_data.get('companyName', 'Your employer'),
+            created
+        )
+    
+    return report
+
+
+@router.delete("/me/workers/{worker_id}")
+async def deactivate_worker(
+    worker_id: str,
+    current_user: dict = Depends(get_current_employer)
+):
+    """Deactivate a worker; their history is kept but attendance is no longer accepted"""
+    employer_id = current_user["uid"]
+    
+    worker_ref = firebase_service.db.collection('workers').document(worker_id)
+    worker_doc = worker_ref.get()
+    
+    if not worker_doc.exists or worker_doc.get('employerId') != employer_id:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Worker not found"
         )
     
+    worker_ref.update({
+        "isActive": False,
+        "updatedAt": datetime.utcnow()
+    })
+    roster_service.invalidate(employer_id)
+    version_index.touch(f"workers/{worker_id}")
+    
+    return {
+        "success": True,
+        "message": "Worker deactivated successfully"
+    }
+
+
+@router.get("/me/dashboard", response_model=EmployerDashboard)
+async def get_employer_dashboard(current_user: dict = Depends(get_current_employer)):
+    """Get employer dashboard statistics"""
     employer_id = current_user["uid"]
     current_month = datetime.utcnow().strftime("%Y-%m")
     
@@ -210,9 +355,7 @@ async def get_employer_dashboard(current_user: dict = Depends(get_current_user))
     pending_settlement = total_earnings - total_withdrawals
     
     # Get employer config for next payday
-    employer_ref = firebase_service.db.collection('employers').document(employer_id)
-    employer_doc = employer_ref.get()
-    employer_data = employer_doc.to_dict() if employer_doc.exists else {}
+    employer_data = await firebase_service.get_employer(employer_id) or {}
     withdrawal_config = employer_data.get('withdrawalConfig', {})
     payday_date = withdrawal_config.get('paydayDate', 1)
     next_payday = wage_calculator.get_next_payday(payday_date)
@@ -230,16 +373,36 @@ async def get_employer_dashboard(current_user: dict = Depends(get_current_user))
 @router.post("/attendance")
 async def submit_attendance(
     attendance_data: AttendanceSubmit,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_employer)
 ):
     """Submit attendance and update wage ledgers"""
-    if current_user.get("role") != "employer":
+    employer_id = current_user["uid"]
+    
+    # Reject the whole batch before any write if it names foreign or inactive workers
+    unknown_workers = roster_service.find_unknown(
+        employer_id, (entry.worker_id for entry in attendance_data.entries)
+    )
+    if unknown_workers:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown or inactive workers: {', '.join(unknown_workers)}"
         )
     
-    employer_id = current_user["uid"]
+    # Archived months are closed; their records live in cold storage
+    archived_months = sorted(
+        month for month in {entry.date[:7] for entry in attendance_data.entries}
+        if archive_service.is_archived(employer_id, month)
+    )
+    if archived_months:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Attendance for archived months cannot be changed: {', '.join(archived_months)}"
+        )
+    
+    # Get employer config once for the whole batch
+    employer_data = await firebase_service.get_employer(employer_id) or {}
+    withdrawal_config = employer_data.get('withdrawalConfig', {})
+    max_percentage = withdrawal_config.get('maxPercentage', 40)
     
     # Process each attendance entry
     processed_entries = []
@@ -251,8 +414,14 @@ async def submit_attendance(
             wage_per_hour=entry.wage_per_hour
         )
         
-        # Create attendance record
-        attendance_id = str(uuid.uuid4())
+        # Attendance is keyed by worker and date, so resubmitting a day
+        # overwrites the record and only the difference reaches the ledger
+        attendance_ref = firebase_service.db.collection('attendance') \
+            .document(attendance_doc_id(entry.worker_id, entry.date))
+        previous_doc = attendance_ref.get()
+        previous_data = previous_doc.to_dict() if previous_doc.exists else {}
+        previous_earned = previous_data.get('totalEarned', 0.0)
+        
         attendance_doc_data = {
             "workerId": entry.worker_id,
             "employerId": employer_id,
@@ -261,49 +430,69 @@ async def submit_attendance(
             "wagePerHour": entry.wage_per_hour,
             "totalEarned": total_earned,
             "status": entry.status,
-            "createdAt": datetime.utcnow()
+            "createdAt": previous_data.get('createdAt', datetime.utcnow()),
+            "updatedAt": datetime.utcnow()
         }
-        
-        attendance_ref = firebase_service.db.collection('attendance').document(attendance_id)
         attendance_ref.set(attendance_doc_data)
+        attendance_analytics.record(
+            employer_id, entry.worker_id, entry.date, entry.hours_worked, total_earned, entry.status
+        )
         
         # Update wage ledger
         entry_month = datetime.strptime(entry.date, "%Y-%m-%d").strftime("%Y-%m")
+        earned_delta = total_earned - previous_earned
         
-        ledger_query = firebase_service.db.collection('wage_ledgers') \
-            .where('workerId', '==', entry.worker_id) \
-            .where('month', '==', entry_month) \
-            .where('status', '==', 'active') \
-            .limit(1)
-        
-        ledger_docs = ledger_query.get()
+        ledger_ref = ledger_service.ledger_ref(entry.worker_id, entry_month)
+        ledger_doc = ledger_ref.get()
+        ledger_created = False
         
-        if ledger_docs:
-            ledger_doc = ledger_docs[0]
-            ledger_data = ledger_doc.to_dict()
-            
-            new_total_earned = ledger_data.get('totalEarned', 0.0) + total_earned
-            total_withdrawn = ledger_data.get('totalWithdrawn', 0.0)
-            
-            # Get employer config
-            employer_ref = firebase_service.db.collection('employers').document(employer_id)
-            employer_doc = employer_ref.get()
-            employer_data = employer_doc.to_dict() if employer_doc.exists else {}
-            withdrawal_config = employer_data.get('withdrawalConfig', {})
-            max_percentage = withdrawal_config.get('maxPercentage', 40)
-            
-            # Calculate new available balance
+        if not ledger_doc.exists:
+            # Workers added after the month rollover (or missed by it) get
+            # their ledger here. Earlier earnings for this day never reached
+            # a ledger, so the new one starts from the full day's amount.
+            new_ledger = ledger_service.build_ledger(
+                entry.worker_id, employer_id, entry_month,
+                withdrawal_config.get('paydayDate', 1),
+                reference=datetime.strptime(entry_month, "%Y-%m")
+            )
             balance_info = wage_calculator.calculate_available_balance(
-                total_earned=new_total_earned,
-                total_withdrawn=total_withdrawn,
+                total_earned=total_earned,
+                total_withdrawn=0.0,
                 max_percentage=max_percentage
             )
-            
-            ledger_doc.reference.update({
-                "totalEarned": new_total_earned,
-                "availableBalance": balance_info['available_to_withdraw'],
-                "updatedAt": datetime.utcnow()
+            new_ledger.update({
+                "totalEarned": total_earned,
+                "availableBalance": balance_info['available_to_withdraw']
             })
+            try:
+                ledger_ref.create(new_ledger)
+                ledger_created = True
+            except google_exceptions.AlreadyExists:
+                # Created concurrently; apply the delta to it below
+                ledger_doc = ledger_ref.get()
+        
+        if ledger_created:
+            version_index.touch(f"wage_ledgers/{ledger_ref.id}")
+        elif earned_delta:
+            ledger_data = ledger_doc.to_dict()
+            
+            if ledger_data.get('status') == 'active':
+                new_total_earned = ledger_data.get('totalEarned', 0.0) + earned_delta
+                total_withdrawn = ledger_data.get('totalWithdrawn', 0.0)
+                
+                # Calculate new available balance
+                balance_info = wage_calculator.calculate_available_balance(
+                    total_earned=new_total_earned,
+                    total_withdrawn=total_withdrawn,
+                    max_percentage=max_percentage
+                )
+                
+                ledger_ref.update({
+                    "totalEarned": new_total_earned,
+                    "availableBalance": balance_info['available_to_withdraw'],
+                    "updatedAt": datetime.utcnow()
+                })
+                version_index.touch(f"wage_ledgers/{ledger_ref.id}")
         
         processed_entries.append({
             "worker_id": entry.worker_id,
@@ -316,3 +505,31 @@ async def submit_attendance(
         "message": f"Processed {len(processed_entries)} attendance entries",
         "entries": processed_entries
     }
+
+
+@router.get("/me/attendance/analytics")
+def get_attendance_analytics(
+    start: date,
+    end: date,
+    group_by: str = Query("worker", pattern="^(worker|day|week)$"),
+    current_user: dict = Depends(get_current_employer)
+):
+    """
+    Hours, earnings and present/absent counts by worker, day or week
+    
+    A sync route, so FastAPI runs it in the threadpool: a first load or
+    refresh of the year reads Firestore.
+    """
+    if end < start or (end - start).days > 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be on or after start and at most one year later"
+        )
+    
+    rows = attendance_analytics.summarize(current_user["uid"], start, end, group_by)
+    return {
+        "start": start,
+        "end": end,
+        "group_by": group_by,
+        "rows": rows
+    }
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.dependencies import get_current_user
-from app.models.settlement import Settlement, SettlementSummary, WorkerSettlement
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.dependencies import get_current_employer
+from app.models.settlement import Settlement, SettlementSummary
 from app.services.firebase_service import firebase_service
+from app.services.version_index import version_index
+from app.services.settlement_service import (
+    settlement_service, NoActiveLedgersError, WORKER_LINE_FIELDS, SUMMARY_FIELDS
+)
+from app.utils.report_writers import WRITERS
+from app.utils.bank_files import TEMPLATES, find_unpayable, stream_bank_file
+from app.utils.etag import make_etag, is_not_modified, not_modified
 from datetime import datetime
-import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,25 +20,36 @@ router = APIRouter(prefix="/api/settlements", tags=["Settlements"])
 
 @router.get("/")
 async def get_settlements(
-    current_user: dict = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_employer),
     limit: int = 12
 ):
     """Get settlement history"""
-    if current_user.get("role") != "employer":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
-        )
-    
     employer_id = current_user["uid"]
+    resource = f"settlements/{employer_id}"
     
+    # Settlements are immutable and listed newest first, so the newest ID
+    # identifies the whole page
+    version = version_index.get(resource)
+    if version and is_not_modified(request, make_etag(resource, version, limit)):
+        return not_modified(make_etag(resource, version, limit))
+    
+    # Only fetch summary fields, never the per-worker lines
     settlements_query = firebase_service.db.collection('settlements') \
         .where('employerId', '==', employer_id) \
         .order_by('settledAt', direction='DESCENDING') \
+        .select(SUMMARY_FIELDS) \
         .limit(limit)
     
+    settlement_docs = settlements_query.get()
+    version = version_index.record(resource, settlement_docs[0].id if settlement_docs else "none")
+    etag = make_etag(resource, version, limit)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
     settlements = []
-    for doc in settlements_query.get():
+    for doc in settlement_docs:
         settlement_data = doc.to_dict()
         settlements.append(SettlementSummary(
             month=settlement_data['month'],
@@ -41,97 +60,104 @@ async def get_settlements(
             status=settlement_data['status']
         ))
     
+    response.headers["ETag"] = etag
     return {"settlements": settlements}
 
 
-@router.post("/process")
-async def process_settlement(
-    month: str,  # YYYY-MM format
-    current_user: dict = Depends(get_current_user)
+@router.get("/{settlement_id}/export")
+async def export_settlement(
+    settlement_id: str,
+    format: str = Query("csv", pattern="^(csv|xlsx|jsonl)$"),
+    current_user: dict = Depends(get_current_employer)
 ):
-    """Process monthly settlement"""
-    if current_user.get("role") != "employer":
+    """Stream a settlement's per-worker breakdown as CSV, XLSX or JSON Lines"""
+    settlement_doc = settlement_service.get_settlement(settlement_id, current_user["uid"])
+    if settlement_doc is None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Employer role required."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Settlement not found"
         )
     
-    employer_id = current_user["uid"]
-    
-    # Get all active ledgers for the month
-    ledgers_query = firebase_service.db.collection('wage_ledgers') \
-        .where('employerId', '==', employer_id) \
-        .where('month', '==', month) \
-        .where('status', '==', 'active')
+    writer, media_type = WRITERS[format]
+    filename = f"settlement-{settlement_doc.get('month')}-{settlement_id[:8]}.{format}"
     
-    ledger_docs = ledgers_query.get()
+    return StreamingResponse(
+        writer(WORKER_LINE_FIELDS, settlement_service.iter_report_rows(settlement_doc)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/{settlement_id}/bank-file")
+async def export_bank_file(
+    settlement_id: str,
+    template: str = Query("neft_csv"),
+    current_user: dict = Depends(get_current_employer)
+):
+    """Stream a bank bulk-payment file paying each worker's net settlement"""
+    bank_template = TEMPLATES.get(template)
+    if bank_template is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown template. Available: {', '.join(TEMPLATES)}"
+        )
     
-    if not ledger_docs:
+    employer_id = current_user["uid"]
+    settlement_doc = settlement_service.get_settlement(settlement_id, employer_id)
+    if settlement_doc is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No active ledgers found for {month}"
+            detail="Settlement not found"
         )
     
-    # Calculate settlement
-    total_earnings = 0.0
-    total_withdrawals = 0.0
-    worker_settlements = []
-    
-    for ledger_doc in ledger_docs:
-        ledger_data = ledger_doc.to_dict()
-        worker_id = ledger_data['workerId']
-        
-        # Get worker details
-        worker_ref = firebase_service.db.collection('workers').document(worker_id)
-        worker_doc = worker_ref.get()
-        worker_data = worker_doc.to_dict() if worker_doc.exists else {}
-        
-        earned = ledger_data.get('totalEarned', 0.0)
-        withdrawn = ledger_data.get('totalWithdrawn', 0.0)
-        net_paid = earned - withdrawn
-        
-        total_earnings += earned
-        total_withdrawals += withdrawn
-        
-        worker_settlements.append({
-            "workerId": worker_id,
-            "workerName": worker_data.get('fullName', 'Unknown'),
-            "earned": earned,
-            "withdrawn": withdrawn,
-            "netPaid": net_paid
-        })
-        
-        # Mark ledger as settled
-        ledger_doc.reference.update({
-            "status": "settled",
-            "updatedAt": datetime.utcnow()
-        })
-    
-    net_settlement = total_earnings - total_withdrawals
+    # Refuse a file that would silently leave workers unpaid
+    unpayable = await run_in_threadpool(
+        find_unpayable, bank_template, settlement_service.iter_payment_lines(settlement_doc)
+    )
+    if unpayable:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": f"{len(unpayable)} workers cannot be paid with the {template} template",
+                "workers": unpayable
+            }
+        )
     
-    # Create settlement record
-    settlement_id = str(uuid.uuid4())
-    settlement_data = {
-        "employerId": employer_id,
-        "month": month,
-        "totalWorkers": len(worker_settlements),
-        "totalEarnings": total_earnings,
-        "totalWithdrawals": total_withdrawals,
-        "netSettlement": net_settlement,
-        "settledAt": datetime.utcnow(),
-        "status": "completed",
-        "workerSettlements": worker_settlements
+    employer_data = await firebase_service.get_employer(employer_id) or {}
+    month = settlement_doc.get('month')
+    file_reference = f"EP{month.replace('-', '')}{settlement_id[:6].upper()}"
+    context = {
+        "debitAccount": (employer_data.get('bankAccount') or {}).get('accountNumber'),
+        "companyName": employer_data.get('companyName'),
+        "fileDate": datetime.utcnow().strftime("%d%m%Y"),
+        "fileReference": file_reference,
+        "narration": f"Wages {month}"
     }
+    filename = f"payout-{month}-{settlement_id[:8]}-{template}.{bank_template.extension}"
     
-    settlement_ref = firebase_service.db.collection('settlements').document(settlement_id)
-    settlement_ref.set(settlement_data)
+    return StreamingResponse(
+        stream_bank_file(bank_template, settlement_service.iter_payment_lines(settlement_doc), context),
+        media_type="text/csv" if bank_template.layout == "csv" else "text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/process")
+async def process_settlement(
+    month: str,  # YYYY-MM format
+    current_user: dict = Depends(get_current_employer)
+):
+    """Process monthly settlement"""
+    try:
+        result = settlement_service.process_settlement(current_user["uid"], month)
+    except NoActiveLedgersError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
     
     return {
         "success": True,
-        "settlement_id": settlement_id,
         "message": f"Settlement processed for {month}",
-        "total_earnings": total_earnings,
-        "total_withdrawals": total_withdrawals,
-        "net_settlement": net_settlement,
-        "workers_count": len(worker_settlements)
+        **result
     }
@@ -1,63 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.dependencies import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.dependencies import get_current_worker, get_profile_doc, get_stream_user
+from app.models.user import BankAccount
 from app.models.worker import WorkerBalance, UpdateUPI, UpdatePassword
-from app.models.withdrawal import WithdrawalRequest, WithdrawalResponse
+from app.models.withdrawal import WithdrawalRequest, WithdrawalResponse, UNRESOLVED_WITHDRAWAL_STATES
+from app.services.archive_service import archive_service
 from app.services.firebase_service import firebase_service
 from app.services.wage_calculator import wage_calculator
 from app.services.upi_service import upi_service
+from app.services.circuit_breaker import CircuitOpenError
 from app.services.notification_service import notification_service
+from app.services.ledger_service import ledger_service
+from app.services.rate_limiter import rate_limiter
+from app.services.read_policy import read_policy
+from app.services.version_index import version_index
+from app.services.realtime_service import realtime_service
+from app.services.risk_service import risk_service
+from app.utils.document_keys import ledger_doc_id
+from app.utils.etag import make_etag, is_not_modified, not_modified
+from app.utils.months import month_bounds
+from app.utils.sync_tokens import make_sync_token, parse_sync_token
+from app.config import settings
 from datetime import datetime
+from typing import Optional
+import asyncio
+import json
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/workers", tags=["Workers"])
 
+# Seconds between keepalives on idle streams
+STREAM_KEEPALIVE_INTERVAL = 15
 
-@router.get("/me")
-async def get_worker_profile(current_user: dict = Depends(get_current_user)):
-    """Get current worker profile"""
-    if current_user.get("role") != "worker":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Worker role required."
-        )
-    
-    # Get worker details from Firestore
-    worker_ref = firebase_service.db.collection('workers').document(current_user["uid"])
-    worker_doc = worker_ref.get()
-    
-    if not worker_doc.exists:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Worker profile not found"
-        )
-    
-    return {"id": current_user["uid"], **worker_doc.to_dict()}
+# Each withdrawal fans out into several Firestore reads and a UPI payout
+withdraw_limits = [
+    Depends(rate_limiter.limit(
+        "withdraw:worker",
+        settings.withdraw_worker_per_minute,
+        settings.withdraw_worker_burst,
+        key_func=lambda user: user["uid"]
+    )),
+    Depends(rate_limiter.limit(
+        "withdraw:employer",
+        settings.withdraw_employer_per_minute,
+        settings.withdraw_employer_burst,
+        key_func=lambda user: firebase_service.get_worker_employer_id(user["uid"])
+    )),
+    Depends(rate_limiter.concurrency("payouts", settings.max_inflight_payouts)),
+]
 
 
-@router.get("/me/balance", response_model=WorkerBalance)
-async def get_worker_balance(current_user: dict = Depends(get_current_user)):
-    """Get worker's current balance and withdrawal limits"""
-    if current_user.get("role") != "worker":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Worker role required."
-        )
-    
-    worker_id = current_user["uid"]
-    
-    # Get current month's wage ledger
-    current_month = datetime.utcnow().strftime("%Y-%m")
-    ledger_query = firebase_service.db.collection('wage_ledgers') \
-        .where(field_path='workerId', op_string='==', value=worker_id) \
-        .where(field_path='month', op_string='==', value=current_month) \
-        .where(field_path='status', op_string='==', value='active') \
-        .limit(1)
-    
-    ledger_docs = ledger_query.get()
-    
-    if not ledger_docs:
+def calculate_worker_balance(ledger_data: Optional[dict], withdrawal_config: dict) -> WorkerBalance:
+    """Build a worker's balance from their current ledger (None if there is none)"""
+    if not ledger_data or ledger_data.get('status') != 'active':
         # No earnings yet this month
         return WorkerBalance(
             total_earned=0.0,
@@ -68,14 +66,6 @@ async def get_worker_balance(current_user: dict = Depends(get_current_user)):
             payday_amount=0.0
         )
     
-    ledger_data = ledger_docs[0].to_dict()
-    
-    # Get employer's withdrawal config
-    employer_ref = firebase_service.db.collection('employers').document(ledger_data['employerId'])
-    employer_doc = employer_ref.get()
-    employer_data = employer_doc.to_dict() if employer_doc.exists else {}
-    
-    withdrawal_config = employer_data.get('withdrawalConfig', {})
     max_percentage = withdrawal_config.get('maxPercentage', 40)
     
     # Calculate available balance
@@ -102,23 +92,299 @@ async def get_worker_balance(current_user: dict = Depends(get_current_user)):
     )
 
 
-@router.get("/me/withdrawals")
-async def get_withdrawal_history(
-    current_user: dict = Depends(get_current_user),
-    limit: int = 20
+@router.get("/me")
+async def get_worker_profile(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_worker)
+):
+    """Get current worker profile"""
+    resource = f"workers/{current_user['uid']}"
+    
+    # Answer revalidation from the version index without reading the document
+    version = version_index.get(resource)
+    if version and is_not_modified(request, make_etag(resource, version)):
+        return not_modified(make_etag(resource, version))
+    
+    # Get worker details (already fetched with the user on a cache miss)
+    worker_doc = await get_profile_doc(request, current_user)
+    
+    if not worker_doc.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Worker profile not found"
+        )
+    
+    etag = make_etag(resource, version_index.record_snapshot(resource, worker_doc))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    response.headers["ETag"] = etag
+    return {"id": current_user["uid"], **worker_doc.to_dict()}
+
+
+@router.get("/me/balance", response_model=WorkerBalance)
+async def get_worker_balance(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_worker)
 ):
-    """Get worker's withdrawal history"""
+    """Get worker's current balance and withdrawal limits"""
+    worker_id = current_user["uid"]
+    current_month = datetime.utcnow().strftime("%Y-%m")
+    resource = f"wage_ledgers/{ledger_doc_id(worker_id, current_month)}"
+    
+    # Get employer's withdrawal config (cached)
+    employer_id = await firebase_service.get_worker_employer_id(worker_id)
+    employer_data = (await firebase_service.get_employer(employer_id) if employer_id else None) or {}
+    withdrawal_config = employer_data.get('withdrawalConfig', {})
+    
+    # The balance depends on the ledger, the withdrawal config and, through
+    # the next payday, on today's date
+    def balance_etag(ledger_version: str) -> str:
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        return make_etag(resource, ledger_version, sorted(withdrawal_config.items()), today)
+    
+    version = version_index.get(resource)
+    if version and is_not_modified(request, balance_etag(version)):
+        return not_modified(balance_etag(version))
+    
+    # Get current month's wage ledger
+    ledger_doc = await read_policy.call_async("wage_ledgers.get", ledger_service.ledger_ref(worker_id, current_month).get)
+    etag = balance_etag(version_index.record_snapshot(resource, ledger_doc))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    response.headers["ETag"] = etag
+    return calculate_worker_balance(ledger_doc.to_dict() if ledger_doc.exists else None, withdrawal_config)
+
+
+async def worker_events(worker_id: str, employer_id: str):
+    """
+    Yield (event, payload) pairs for a connected worker: the current
+    balance, then balance deltas and withdrawal updates as they happen
+    """
+    async with realtime_service.subscribe(employer_id, worker_id) as (channel, queue):
+        ledger_data = channel.ledgers.get(worker_id)
+        if ledger_data is None:
+            current_month = datetime.utcnow().strftime("%Y-%m")
+            ledger_doc = await asyncio.to_thread(ledger_service.ledger_ref(worker_id, current_month).get)
+            ledger_data = ledger_doc.to_dict() if ledger_doc.exists else None
+        
+        withdrawal_config = (await firebase_service.get_employer(employer_id) or {}).get('withdrawalConfig', {})
+        balance = calculate_worker_balance(ledger_data, withdrawal_config)
+        yield "balance", {"balance": balance, "changed": {}}
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield "keepalive", None
+                continue
+            
+            if event["type"] == "withdrawal":
+                yield "withdrawal", event["data"]
+                continue
+            
+            withdrawal_config = (await firebase_service.get_employer(employer_id) or {}).get('withdrawalConfig', {})
+            new_balance = calculate_worker_balance(event["data"], withdrawal_config)
+            changed = {
+                field: round(value - getattr(balance, field), 2)
+                for field, value in new_balance.model_dump().items()
+                if isinstance(value, float) and value != getattr(balance, field)
+            }
+            if changed:
+                balance = new_balance
+                yield "balance", {"balance": balance, "changed": changed}
+
+
+async def _require_worker_employer(current_user: dict) -> str:
+    """Check the caller is a worker and return their employer ID"""
     if current_user.get("role") != "worker":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Worker role required."
         )
     
+    employer_id = await firebase_service.get_worker_employer_id(current_user["uid"])
+    if not employer_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Worker profile not found"
+        )
+    
+    return employer_id
+
+
+@router.get("/me/stream")
+async def stream_worker_updates(
+    request: Request,
+    current_user: dict = Depends(get_stream_user)
+):
+    """Stream balance and withdrawal updates as Server-Sent Events"""
+    employer_id = await _require_worker_employer(current_user)
+    
+    async def event_stream():
+        async for event, payload in worker_events(current_user["uid"], employer_id):
+            if await request.is_disconnected():
+                break
+            if event == "keepalive":
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/me/ws")
+async def worker_updates_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """Same events as /me/stream over a WebSocket (token passed as ?token=)"""
+    try:
+        current_user = await get_stream_user(token=token, authorization=websocket.headers.get("authorization"))
+        employer_id = await _require_worker_employer(current_user)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    
+    await websocket.accept()
+    try:
+        async for event, payload in worker_events(current_user["uid"], employer_id):
+            await websocket.send_json({"event": event, "data": jsonable_encoder(payload)})
+    except WebSocketDisconnect:
+        pass
+
+
+# Withdrawals sent on a full sync (no token)
+SYNC_FULL_WITHDRAWALS = 50
+
+
+@router.get("/me/sync")
+async def sync_worker_data(
+    request: Request,
+    since: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_worker)
+):
+    """
+    Return what changed since the client's last sync token
+    
+    Without a token everything the app shows is returned (profile, this
+    month's ledger and balance, attendance this month, recent withdrawals).
+    With one, only documents written since then are included. Always
+    returns a new token to send next time.
+    """
+    worker_id = current_user["uid"]
+    synced_at = datetime.utcnow()
+    current_month = synced_at.strftime("%Y-%m")
+    
+    if since is not None:
+        try:
+            since_time = parse_sync_token(since)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    else:
+        since_time = None
+    
+    def changed(snapshot) -> bool:
+        return snapshot.exists and (
+            since_time is None
+            or snapshot.update_time.replace(tzinfo=None) > since_time
+        )
+    
+    result = {"token": make_sync_token(synced_at), "full": since_time is None}
+    
+    worker_doc = await get_profile_doc(request, current_user)
+    if changed(worker_doc):
+        result["profile"] = {"id": worker_id, **worker_doc.to_dict()}
+    
+    # A new month's ledger may predate the token, so send it on the first
+    # sync of each month regardless
+    ledger_doc = ledger_service.ledger_ref(worker_id, current_month).get()
+    if changed(ledger_doc) or (
+        ledger_doc.exists and since_time and since_time.strftime("%Y-%m") != current_month
+    ):
+        ledger_data = ledger_doc.to_dict()
+        employer_data = await firebase_service.get_employer(ledger_data['employerId']) or {}
+        result["ledger"] = {"id": ledger_doc.id, **ledger_data}
+        result["balance"] = calculate_worker_balance(ledger_data, employer_data.get('withdrawalConfig', {}))
+    
+    # Composite indexes (see README): withdrawals on workerId + requestedAt
+    # (desc) and workerId + updatedAt; attendance on workerId + date and
+    # workerId + updatedAt
+    withdrawals_query = firebase_service.db.collection('withdrawals') \
+        .where(field_path='workerId', op_string='==', value=worker_id)
+    attendance_query = firebase_service.db.collection('attendance') \
+        .where(field_path='workerId', op_string='==', value=worker_id)
+    
+    if since_time is None:
+        withdrawals_query = withdrawals_query \
+            .order_by('requestedAt', direction='DESCENDING') \
+            .limit(SYNC_FULL_WITHDRAWALS)
+        attendance_query = attendance_query \
+            .where(field_path='date', op_string='>=', value=datetime.strptime(current_month, "%Y-%m")) \
+            .order_by('date')
+    else:
+        withdrawals_query = withdrawals_query \
+            .where(field_path='updatedAt', op_string='>', value=since_time) \
+            .order_by('updatedAt')
+        attendance_query = attendance_query \
+            .where(field_path='updatedAt', op_string='>', value=since_time) \
+            .order_by('updatedAt')
+    
+    withdrawals = [{"id": doc.id, **doc.to_dict()} for doc in withdrawals_query.stream()]
+    if withdrawals:
+        result["withdrawals"] = withdrawals
+    
+    attendance = [
+        {"id": doc.id, **doc.to_dict()}
+        for doc in attendance_query.select(['date', 'hoursWorked', 'wagePerHour', 'totalEarned', 'status']).stream()
+    ]
+    if attendance:
+        result["attendance"] = attendance
+    
+    return result
+
+
+@router.get("/me/withdrawals")
+async def get_withdrawal_history(
+    current_user: dict = Depends(get_current_worker),
+    limit: int = 20,
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$")
+):
+    """
+    Get worker's withdrawal history
+    
+    With `month`, only that month's withdrawals are returned; archived
+    months are read from cold storage.
+    """
     worker_id = current_user["uid"]
     
+    if month:
+        employer_id = await firebase_service.get_worker_employer_id(worker_id)
+        if employer_id and archive_service.is_archived(employer_id, month):
+            withdrawals = sorted(
+                (record for record in archive_service.read(employer_id, month, 'withdrawals')
+                 if record.get('workerId') == worker_id),
+                key=lambda record: record['requestedAt'],
+                reverse=True
+            )
+            return {"withdrawals": withdrawals[:limit], "archived": True}
+    
     # Query withdrawals
     withdrawals_query = firebase_service.db.collection('withdrawals') \
-        .where(field_path='workerId', op_string='==', value=worker_id) \
+        .where(field_path='workerId', op_string='==', value=worker_id)
+    if month:
+        start, end = month_bounds(month)
+        withdrawals_query = withdrawals_query \
+            .where(field_path='requestedAt', op_string='>=', value=start) \
+            .where(field_path='requestedAt', op_string='<', value=end)
+    withdrawals_query = withdrawals_query \
         .order_by('requestedAt', direction='DESCENDING') \
         .limit(limit)
     
@@ -133,46 +399,33 @@ async def get_withdrawal_history(
     return {"withdrawals": withdrawals}
 
 
-@router.post("/me/withdraw", response_model=WithdrawalResponse)
+@router.post("/me/withdraw", response_model=WithdrawalResponse, dependencies=withdraw_limits)
 async def request_withdrawal(
     withdrawal_request: WithdrawalRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_worker)
 ):
     """Request instant withdrawal"""
-    if current_user.get("role") != "worker":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Worker role required."
-        )
-    
     worker_id = current_user["uid"]
     
-    # Get current balance
-    balance_response = await get_worker_balance(current_user)
-    
-    # Get employer config for limits
+    # Get current month's wage ledger
     current_month = datetime.utcnow().strftime("%Y-%m")
-    ledger_query = firebase_service.db.collection('wage_ledgers') \
-        .where(field_path='workerId', op_string='==', value=worker_id) \
-        .where(field_path='month', op_string='==', value=current_month) \
-        .where(field_path='status', op_string='==', value='active') \
-        .limit(1)
+    ledger_doc = ledger_service.ledger_ref(worker_id, current_month).get()
     
-    ledger_docs = ledger_query.get()
-    if not ledger_docs:
+    if not ledger_doc.exists or ledger_doc.to_dict().get('status') != 'active':
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No active wage ledger found"
         )
     
-    ledger_doc = ledger_docs[0]
     ledger_data = ledger_doc.to_dict()
     
-    employer_ref = firebase_service.db.collection('employers').document(ledger_data['employerId'])
-    employer_doc = employer_ref.get()
-    employer_data = employer_doc.to_dict() if employer_doc.exists else {}
+    # Get employer config for limits
+    employer_data = await firebase_service.get_employer(ledger_data['employerId']) or {}
     withdrawal_config = employer_data.get('withdrawalConfig', {})
     
+    # Get current balance
+    balance_response = calculate_worker_balance(ledger_data, withdrawal_config)
+    
     # Validate withdrawal amount
     is_valid, error_message = wage_calculator.validate_withdrawal_amount(
         amount=withdrawal_request.amount,
@@ -187,8 +440,43 @@ async def request_withdrawal(
             detail=error_message
         )
     
-    # Create withdrawal record
+    # A payout whose outcome is not yet known may still be paid; the balance
+    # only reflects it once it is resolved, so hold further withdrawals
+    unresolved = firebase_service.db.collection('withdrawals') \
+        .where(field_path='workerId', op_string='==', value=worker_id) \
+        .where(field_path='status', op_string='in', value=UNRESOLVED_WITHDRAWAL_STATES) \
+        .limit(1) \
+        .get()
+    if unresolved:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Your previous withdrawal is still being confirmed. Please try again later."
+        )
+    
+    # Score fraud risk from shared window statistics (no Firestore reads)
     withdrawal_id = str(uuid.uuid4())
+    risk = risk_service.assess(worker_id, withdrawal_request.upi_id, withdrawal_request.amount)
+    risk_service.record_decision(
+        risk, worker_id, withdrawal_id, withdrawal_request.upi_id, withdrawal_request.amount
+    )
+    
+    if risk.action == "block":
+        logger.warning(f"Blocked withdrawal for worker {worker_id} (score {risk.score}): {risk.reasons}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Withdrawal held for review. Please contact your employer."
+        )
+    
+    # Fail fast while the payout gateway is down rather than hold a
+    # request slot and a processing withdrawal until it times out
+    if not upi_service.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payouts are temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(upi_service.breaker.stats()["retry_after"])}
+        )
+    
+    # Create withdrawal record
     withdrawal_data = {
         "workerId": worker_id,
         "employerId": ledger_data['employerId'],
@@ -197,7 +485,10 @@ async def request_withdrawal(
         "status": "processing",
         "requestedAt": datetime.utcnow(),
         "ledgerId": ledger_doc.id,
-        "feeAmount": 0.0
+        "feeAmount": 0.0,
+        "riskScore": risk.score,
+        "riskAction": risk.action,
+        "updatedAt": datetime.utcnow()
     }
     
     # Save to Firestore
@@ -217,7 +508,8 @@ async def request_withdrawal(
             withdrawal_ref.update({
                 "status": "completed",
                 "completedAt": datetime.utcnow(),
-                "transactionId": payout_result["transaction_id"]
+                "transactionId": payout_result["transaction_id"],
+                "updatedAt": datetime.utcnow()
             })
             
             # Update ledger
@@ -226,6 +518,8 @@ async def request_withdrawal(
                 "availableBalance": ledger_data.get('availableBalance', 0.0) - withdrawal_request.amount,
                 "updatedAt": datetime.utcnow()
             })
+            version_index.touch(f"wage_ledgers/{ledger_doc.id}")
+            risk_service.record_withdrawal(worker_id, withdrawal_request.upi_id, withdrawal_request.amount)
             
             # Send notification
             await notification_service.send_withdrawal_confirmation(
@@ -245,7 +539,8 @@ async def request_withdrawal(
             # Payout failed
             withdrawal_ref.update({
                 "status": "failed",
-                "failureReason": payout_result.get("message", "Payout failed")
+                "failureReason": payout_result.get("message", "Payout failed"),
+                "updatedAt": datetime.utcnow()
             })
             
             raise HTTPException(
@@ -253,11 +548,42 @@ async def request_withdrawal(
                 detail="Withdrawal failed. Please try again."
             )
     
+    except asyncio.TimeoutError:
+        # The gateway may have accepted the payout before the timeout, so it
+        # is not failed: the reconcile_withdrawals cron (every 15 minutes)
+        # resolves it with the gateway once it is STUCK_AFTER old
+        logger.error(f"Payout for withdrawal {withdrawal_id} timed out; outcome unknown")
+        withdrawal_ref.update({
+            "status": "unknown",
+            "updatedAt": datetime.utcnow()
+        })
+        return WithdrawalResponse(
+            id=withdrawal_id,
+            amount=withdrawal_request.amount,
+            status="unknown",
+            requested_at=withdrawal_data["requestedAt"],
+            estimated_completion="Within 30 minutes",
+            message="Your withdrawal is being confirmed with the bank. Your balance will update shortly."
+        )
+    
+    except CircuitOpenError as e:
+        withdrawal_ref.update({
+            "status": "failed",
+            "failureReason": "Payout gateway unavailable",
+            "updatedAt": datetime.utcnow()
+        })
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payouts are temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
     except Exception as e:
         logger.error(f"Withdrawal processing error: {e}")
         withdrawal_ref.update({
             "status": "failed",
-            "failureReason": str(e)
+            "failureReason": str(e),
+            "updatedAt": datetime.utcnow()
         })
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -268,15 +594,9 @@ async def request_withdrawal(
 @router.put("/me/upi")
 async def update_upi_id(
     upi_update: UpdateUPI,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_worker)
 ):
     """Update worker's UPI ID"""
-    if current_user.get("role") != "worker":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Worker role required."
-        )
-    
     worker_id = current_user["uid"]
     
     # Update in workers collection
@@ -285,6 +605,8 @@ async def update_upi_id(
         "upiId": upi_update.upi_id,
         "updatedAt": datetime.utcnow()
     })
+    version_index.touch(f"workers/{worker_id}")
+    risk_service.record_upi_change(worker_id)
     
     # Update in users collection
     user_ref = firebase_service.db.collection('users').document(worker_id)
@@ -292,6 +614,7 @@ async def update_upi_id(
         "upiId": upi_update.upi_id,
         "updatedAt": datetime.utcnow()
     })
+    firebase_service.invalidate_user(worker_id)
     
     return {
         "success": True,
@@ -300,18 +623,37 @@ async def update_upi_id(
     }
 
 
+@router.put("/me/bank-account")
+async def update_bank_account(
+    bank_account: BankAccount,
+    current_user: dict = Depends(get_current_worker)
+):
+    """Set the bank account used for month-end settlement payouts"""
+    worker_id = current_user["uid"]
+    
+    worker_ref = firebase_service.db.collection('workers').document(worker_id)
+    worker_ref.update({
+        "bankAccount": {
+            "accountNumber": bank_account.account_number,
+            "ifsc": bank_account.ifsc,
+            "accountHolderName": bank_account.account_holder_name
+        },
+        "updatedAt": datetime.utcnow()
+    })
+    version_index.touch(f"workers/{worker_id}")
+    
+    return {
+        "success": True,
+        "message": "Bank account updated successfully"
+    }
+
+
 @router.put("/me/password")
 async def update_password(
     password_update: UpdatePassword,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_worker)
 ):
     """Update worker's password"""
-    if current_user.get("role") != "worker":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Worker role required."
-        )
-    
     worker_id = current_user["uid"]
     
     # Update in users collection
@@ -320,6 +662,7 @@ async def update_password(
         "password": password_update.password,
         "updatedAt": datetime.utcnow()
     })
+    firebase_service.invalidate_user(worker_id)
     
     return {
         "success": True,
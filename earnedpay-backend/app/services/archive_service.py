@@ -0,0 +1,143 @@
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.firebase_service import firebase_service
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+import gzip
+import io
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Collections moved to cold storage per employer-month
+ARCHIVED_COLLECTIONS = ("attendance", "wage_ledgers", "withdrawals")
+
+# Fields restored to datetimes when reading archived records
+DATETIME_FIELDS = {
+    "date", "createdAt", "updatedAt", "requestedAt", "completedAt",
+    "reconciledAt", "rebuiltAt", "paydayDate"
+}
+
+
+class LocalArchiveBackend:
+    """Archive files under a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def write(self, path: str, data: bytes):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(full_path + ".tmp", full_path)
+
+    def read(self, path: str) -> Optional[bytes]:
+        full_path = os.path.join(self.root, path)
+        if not os.path.exists(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            return f.read()
+
+
+class BucketArchiveBackend:
+    """Archive files in a Firebase Storage (Cloud Storage) bucket"""
+
+    def __init__(self, bucket_name: str):
+        from firebase_admin import storage
+        self.bucket = storage.bucket(bucket_name)
+
+    def write(self, path: str, data: bytes):
+        self.bucket.blob(path).upload_from_string(data, content_type="application/gzip")
+
+    def read(self, path: str) -> Optional[bytes]:
+        blob = self.bucket.blob(path)
+        if not blob.exists():
+            return None
+        return blob.download_as_bytes()
+
+
+class ArchiveService:
+    """
+    Cold storage for settled employer-months
+
+    Each archived employer-month has one gzipped JSON Lines file per
+    collection at `{employerId}/{YYYY-MM}/{collection}.jsonl.gz` and a
+    tombstone document at `archives/{employerId}_{YYYY-MM}` with record
+    counts and totals. Readers check the tombstone and read the file
+    instead of querying the hot collections.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if settings.archive_bucket:
+                self._backend = BucketArchiveBackend(settings.archive_bucket)
+            else:
+                logger.warning(f"archive_bucket is not set; archive files live on local disk under {settings.archive_dir}")
+                self._backend = LocalArchiveBackend(settings.archive_dir)
+        return self._backend
+
+    @staticmethod
+    def tombstone_id(employer_id: str, month: str) -> str:
+        return f"{employer_id}_{month}"
+
+    @staticmethod
+    def path(employer_id: str, month: str, collection: str) -> str:
+        return f"{employer_id}/{month}/{collection}.jsonl.gz"
+
+    def write(self, employer_id: str, month: str, collection: str, records: Iterable[dict]) -> int:
+        """Write records (each with an `id`) as one compressed file; returns the count"""
+        buffer = io.BytesIO()
+        count = 0
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as f:
+            for record in records:
+                f.write((json.dumps(record, default=lambda value: value.isoformat()) + "\n").encode("utf-8"))
+                count += 1
+        self.backend.write(self.path(employer_id, month, collection), buffer.getvalue())
+        return count
+
+    def read(self, employer_id: str, month: str, collection: str) -> Iterator[dict]:
+        """Yield archived records, with datetime fields restored"""
+        data = self.backend.read(self.path(employer_id, month, collection))
+        if data is None:
+            logger.error(f"Archive file missing for {employer_id} {month} {collection}")
+            return
+
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+            for line in f:
+                record = json.loads(line)
+                for field in DATETIME_FIELDS & record.keys():
+                    if isinstance(record[field], str):
+                        record[field] = datetime.fromisoformat(record[field])
+                yield record
+
+    def get_tombstone(self, employer_id: str, month: str) -> Optional[dict]:
+        """Tombstone for an archived employer-month (cached), or None if not archived"""
+        def load():
+            doc = firebase_service.db.collection('archives').document(self.tombstone_id(employer_id, month)).get()
+            return doc.to_dict() if doc.exists else None
+
+        return cache_service.get_or_load("archives", self.tombstone_id(employer_id, month), load)
+
+    def is_archived(self, employer_id: str, month: str) -> bool:
+        return self.get_tombstone(employer_id, month) is not None
+
+    def archived_months(self, employer_id: str, year: int) -> list[str]:
+        """Archived months of `year` for an employer"""
+        return [
+            month for month in (f"{year}-{m:02d}" for m in range(1, 13))
+            if self.is_archived(employer_id, month)
+        ]
+
+    def write_tombstone(self, employer_id: str, month: str, tombstone: dict):
+        firebase_service.db.collection('archives').document(self.tombstone_id(employer_id, month)).set(tombstone)
+        cache_service.invalidate("archives", self.tombstone_id(employer_id, month))
+
+
+archive_service = ArchiveService()
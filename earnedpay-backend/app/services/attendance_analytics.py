@@ -0,0 +1,260 @@
+from app.config import settings
+from app.services.archive_service import archive_service
+from app.services.firebase_service import firebase_service
+from app.utils.pagination import paginate
+from app.utils.sync_tokens import SYNC_OVERLAP
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from itertools import chain
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Status codes stored per cell; 0 means no attendance recorded
+STATUS_CODES = {"present": 1, "absent": 2, "half_day": 3, "leave": 4}
+OTHER_STATUS = 5
+PRESENT = STATUS_CODES["present"]
+ABSENT = STATUS_CODES["absent"]
+HALF_DAY = STATUS_CODES["half_day"]
+
+GROUP_BY = ("worker", "day", "week")
+
+
+class AttendanceYear:
+    """
+    One employer's attendance for a calendar year as columnar arrays
+
+    Each metric is a flat array with one row of `days` cells per worker
+    (cell = row * days + day_of_year), so a worker's range is a contiguous
+    slice and a day across all workers is a strided slice; both are summed
+    and counted in C without touching Python objects per cell.
+    """
+
+    def __init__(self, year: int):
+        self.year = year
+        self.start = date(year, 1, 1)
+        self.days = (date(year + 1, 1, 1) - self.start).days
+        self.rows = {}              # worker_id -> row
+        self.synced_at = None       # UTC time the last load or refresh started
+        self.hours = array('f')
+        self.earned = array('d')
+        self.status = array('b')
+        self.lock = threading.Lock()
+
+    def _row(self, worker_id: str) -> int:
+        row = self.rows.get(worker_id)
+        if row is None:
+            row = self.rows[worker_id] = len(self.rows)
+            self.hours.extend(array('f', bytes(4 * self.days)))
+            self.earned.extend(array('d', bytes(8 * self.days)))
+            self.status.extend(array('b', bytes(self.days)))
+        return row
+
+    def set(self, worker_id: str, day: date, hours: float, earned: float, status: str):
+        with self.lock:
+            cell = self._row(worker_id) * self.days + (day - self.start).days
+            self.hours[cell] = hours
+            self.earned[cell] = earned
+            self.status[cell] = STATUS_CODES.get(status, OTHER_STATUS)
+
+    @staticmethod
+    def _totals(hours, earned, status) -> dict:
+        present = status.count(PRESENT)
+        absent = status.count(ABSENT)
+        half_day = status.count(HALF_DAY)
+        recorded = len(status) - status.count(0)
+        return {
+            "hours": round(sum(hours), 2),
+            "earnings": round(sum(earned), 2),
+            "present": present,
+            "absent": absent,
+            "half_day": half_day,
+            "days_recorded": recorded
+        }
+
+    def by_worker(self, first: int, last: int) -> dict:
+        """Totals per worker for days [first, last)"""
+        with self.lock:
+            result = {}
+            for worker_id, row in self.rows.items():
+                base = row * self.days
+                result[worker_id] = self._totals(
+                    self.hours[base + first:base + last],
+                    self.earned[base + first:base + last],
+                    self.status[base + first:base + last]
+                )
+            return result
+
+    def by_day(self, first: int, last: int) -> dict:
+        """Totals across all workers for each day in [first, last)"""
+        with self.lock:
+            return {
+                self.start + timedelta(days=day): self._totals(
+                    self.hours[day::self.days],
+                    self.earned[day::self.days],
+                    self.status[day::self.days]
+                )
+                for day in range(first, last)
+            }
+
+
+class AttendanceAnalytics:
+    """
+    In-memory columnar attendance store for employer reporting
+
+    A year is loaded on first use from its archived months' files and one
+    paginated Firestore query for the rest, and then kept current by
+    `record` from submit_attendance. Once a copy is older than
+    `attendance_analytics_ttl` it is refreshed with only the records
+    updated since it was last synced, which picks up writes made by other
+    processes without re-reading the year.
+    """
+
+    def __init__(self, ttl: int, max_stores: int):
+        self._ttl = ttl
+        self._max_stores = max_stores
+        self._stores = OrderedDict()    # (employer_id, year) -> (AttendanceYear, loaded_at)
+        self._lock = threading.Lock()
+
+    def _load(self, employer_id: str, year: int) -> AttendanceYear:
+        store = AttendanceYear(year)
+        store.synced_at = datetime.utcnow()
+        query = firebase_service.db.collection('attendance') \
+            .where('employerId', '==', employer_id) \
+            .where('date', '>=', datetime(year, 1, 1)) \
+            .where('date', '<', datetime(year + 1, 1, 1)) \
+            .order_by('date') \
+            .select(['workerId', 'date', 'hoursWorked', 'totalEarned', 'status'])
+
+        started = time.perf_counter()
+        count = 0
+        archived = (
+            record
+            for month in archive_service.archived_months(employer_id, year)
+            for record in archive_service.read(employer_id, month, 'attendance')
+        )
+        for data in chain(archived, (doc.to_dict() for doc in paginate(query, page_size=1000))):
+            store.set(
+                data['workerId'],
+                data['date'].date(),
+                data.get('hoursWorked', 0.0),
+                data.get('totalEarned', 0.0),
+                data.get('status', 'present')
+            )
+            count += 1
+
+        logger.info(
+            f"Loaded {count} attendance records for employer {employer_id} ({year}) "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return store
+
+    def _refresh(self, employer_id: str, store: AttendanceYear):
+        """Apply attendance updated since the store was last synced"""
+        synced_at = datetime.utcnow()
+        query = firebase_service.db.collection('attendance') \
+            .where('employerId', '==', employer_id) \
+            .where('updatedAt', '>', store.synced_at - SYNC_OVERLAP) \
+            .order_by('updatedAt') \
+            .select(['workerId', 'date', 'hoursWorked', 'totalEarned', 'status'])
+
+        count = 0
+        for doc in paginate(query, page_size=1000):
+            data = doc.to_dict()
+            day = data['date'].date()
+            if day.year != store.year:
+                continue
+            store.set(
+                data['workerId'],
+                day,
+                data.get('hoursWorked', 0.0),
+                data.get('totalEarned', 0.0),
+                data.get('status', 'present')
+            )
+            count += 1
+
+        store.synced_at = synced_at
+        logger.debug(f"Refreshed {count} attendance records for employer {employer_id} ({store.year})")
+
+    def _store(self, employer_id: str, year: int) -> AttendanceYear:
+        key = (employer_id, year)
+        with self._lock:
+            entry = self._stores.get(key)
+            if entry and time.monotonic() - entry[1] < self._ttl:
+                self._stores.move_to_end(key)
+                return entry[0]
+
+        if entry:
+            store = entry[0]
+            self._refresh(employer_id, store)
+        else:
+            store = self._load(employer_id, year)
+        with self._lock:
+            self._stores[key] = (store, time.monotonic())
+            self._stores.move_to_end(key)
+            while len(self._stores) > self._max_stores:
+                self._stores.popitem(last=False)
+        return store
+
+    def record(self, employer_id: str, worker_id: str, day: str, hours: float, earned: float, status: str):
+        """Apply a submitted attendance entry to the loaded year, if any"""
+        parsed = datetime.strptime(day, "%Y-%m-%d").date()
+        with self._lock:
+            entry = self._stores.get((employer_id, parsed.year))
+        if entry:
+            entry[0].set(worker_id, parsed, hours, earned, status)
+
+    def summarize(self, employer_id: str, start: date, end: date, group_by: str) -> list[dict]:
+        """
+        Aggregate attendance for days in [start, end] by worker, day or ISO week
+
+        Each row has hours, earnings, present/absent/half-day counts and the
+        number of days with any attendance recorded.
+        """
+        groups = {}
+        for year in range(start.year, end.year + 1):
+            store = self._store(employer_id, year)
+            first = (max(start, store.start) - store.start).days
+            last = (min(end, date(year, 12, 31)) - store.start).days + 1
+
+            if group_by == "worker":
+                totals = store.by_worker(first, last)
+            else:
+                totals = {}
+                for day, day_totals in store.by_day(first, last).items():
+                    if group_by == "week":
+                        iso_year, iso_week, _ = day.isocalendar()
+                        key = f"{iso_year}-W{iso_week:02d}"
+                    else:
+                        key = day.isoformat()
+                    totals[key] = self._merge(totals.get(key), day_totals)
+
+            for key, key_totals in totals.items():
+                groups[key] = self._merge(groups.get(key), key_totals)
+
+        key_name = {"worker": "worker_id", "day": "date", "week": "week"}[group_by]
+        rows = []
+        for key in sorted(groups):
+            totals = groups[key]
+            marked = totals["present"] + totals["absent"]
+            totals["absence_rate"] = round(totals["absent"] / marked, 4) if marked else 0.0
+            rows.append({key_name: key, **totals})
+        return rows
+
+    @staticmethod
+    def _merge(current, totals: dict) -> dict:
+        if current is None:
+            return dict(totals)
+        return {
+            name: round(current[name] + value, 2) if isinstance(value, float) else current[name] + value
+            for name, value in totals.items()
+        }
+
+
+attendance_analytics = AttendanceAnalytics(
+    ttl=settings.attendance_analytics_ttl,
+    max_stores=settings.attendance_analytics_max_stores
+)
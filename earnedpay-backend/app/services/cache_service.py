@@ -0,0 +1,230 @@
+from app.config import settings
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "earnedpay:cache:invalidate"
+
+
+def _encode(value: Any) -> str:
+    """Serialize a cache value, preserving datetimes"""
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {"__datetime__": obj.isoformat()}
+        raise TypeError(f"Cannot cache value of type {type(obj).__name__}")
+    return json.dumps(value, default=default)
+
+
+def _decode(raw: str) -> Any:
+    """Deserialize a cache value produced by `_encode`"""
+    def object_hook(obj):
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        return obj
+    return json.loads(raw, object_hook=object_hook)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheService:
+    """
+    Two-level cache shared by all gunicorn workers on a node
+
+    L1 is an in-process LRU; L2 is a Redis-protocol store (Redis, Valkey,
+    KeyDB, ...) reachable at `CACHE_REDIS_URL`. Invalidations are published
+    on a pub/sub channel so every worker evicts its L1 copy. Without a
+    configured or reachable L2 the cache degrades to L1 only.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = "",
+        max_entries: int = 10000,
+        default_ttl: int = 300
+    ):
+        self.default_ttl = default_ttl
+        self.local = LRUCache(max_entries)
+        self._redis = None
+        self._pubsub_thread = None
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "invalidations": 0}
+        if redis_url:
+            self._connect(redis_url)
+
+    def _connect(self, redis_url: str):
+        """Connect to the shared store and subscribe to invalidations"""
+        try:
+            import redis
+        except ImportError:
+            logger.warning("redis package not installed; shared cache tier disabled")
+            return
+
+        try:
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, decode_responses=True)
+            self._redis.ping()
+        except Exception as e:
+            logger.warning(f"Shared cache unavailable at {redis_url}: {e}")
+            self._redis = None
+            return
+
+        self._start_listener()
+        logger.info(f"Shared cache connected (pid {os.getpid()})")
+
+    def _start_listener(self):
+        """Evict L1 entries invalidated by any process"""
+        def on_message(message):
+            self.local.delete(message["data"])
+
+        try:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: on_message})
+            self._pubsub_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener failed to start: {e}")
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"earnedpay:{namespace}:{key}"
+
+    @property
+    def redis(self):
+        """Shared store client for other node-wide state, or None"""
+        return self._redis
+
+    @property
+    def shared(self) -> bool:
+        """Whether the shared tier is active"""
+        return self._redis is not None
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Get a cached value, or None on miss"""
+        full_key = self._key(namespace, key)
+
+        value = self.local.get(full_key)
+        if value is not None:
+            self._stats["l1_hits"] += 1
+            return value
+
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.get(full_key)
+                pipe.ttl(full_key)
+                raw, ttl = pipe.execute()
+            except Exception as e:
+                logger.warning(f"Shared cache read failed for {full_key}: {e}")
+                raw = None
+
+            if raw is not None:
+                value = _decode(raw)
+                self.local.set(full_key, value, ttl if ttl > 0 else self.default_ttl)
+                self._stats["l2_hits"] += 1
+                return value
+
+        self._stats["misses"] += 1
+        return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value in both tiers"""
+        ttl = ttl or self.default_ttl
+        full_key = self._key(namespace, key)
+        self.local.set(full_key, value, ttl)
+
+        if self._redis is not None:
+            try:
+                self._redis.set(full_key, _encode(value), ex=max(1, int(ttl)))
+            except Exception as e:
+                logger.warning(f"Shared cache write failed for {full_key}: {e}")
+
+    def invalidate(self, namespace: str, key: str):
+        """Remove a value from every process's cache"""
+        full_key = self._key(namespace, key)
+        self.local.delete(full_key)
+        self._stats["invalidations"] += 1
+
+        if self._redis is not None:
+            try:
+                self._redis.delete(full_key)
+                self._redis.publish(INVALIDATION_CHANNEL, full_key)
+            except Exception as e:
+                logger.warning(f"Shared cache invalidation failed for {full_key}: {e}")
+
+    def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Optional[Any]],
+        ttl: Optional[float] = None
+    ) -> Optional[Any]:
+        """Return the cached value, calling `loader` and caching its result on miss"""
+        value = self.get(namespace, key)
+        if value is not None:
+            return value
+
+        value = loader()
+        if value is not None:
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process"""
+        lookups = self._stats["l1_hits"] + self._stats["l2_hits"] + self._stats["misses"]
+        hits = self._stats["l1_hits"] + self._stats["l2_hits"]
+        return {
+            **self._stats,
+            "local_entries": len(self.local),
+            "shared": self.shared,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+cache_service = CacheService(
+    redis_url=settings.cache_redis_url,
+    max_entries=settings.cache_local_max_entries,
+    default_ttl=settings.cache_default_ttl
+)
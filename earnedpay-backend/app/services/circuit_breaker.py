@@ -0,0 +1,130 @@
+from collections import deque
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} circuit is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Count-based circuit breaker over the last `window` calls
+
+    Trips when at least `min_calls` have been seen and the share of failed
+    or slow calls reaches `failure_rate`. While open, calls fail fast for
+    `open_seconds`; then up to `half_open_calls` trial calls are let
+    through, and the circuit closes only if all of them succeed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+        half_open_calls: int
+    ):
+        self.name = name
+        self._outcomes = deque(maxlen=window)   # (failed, slow)
+        self._min_calls = min_calls
+        self._failure_rate = failure_rate
+        self._slow_call_seconds = slow_call_seconds
+        self._open_seconds = open_seconds
+        self._half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0}
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._opened_at + self._open_seconds - time.monotonic()))
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._stats["opened"] += 1
+        logger.error(f"{self.name} circuit opened")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self._open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def acquire(self):
+        """
+        Admit a call or raise CircuitOpenError
+
+        Every admitted call must be followed by exactly one `record`.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self._open_seconds:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, self._retry_after())
+                self._state = HALF_OPEN
+                self._trials = 0
+                self._trial_successes = 0
+                logger.info(f"{self.name} circuit half-open, probing")
+
+            if self._state == HALF_OPEN:
+                if self._trials >= self._half_open_calls:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, 1)
+                self._trials += 1
+
+    def record(self, duration: float, failed: bool):
+        """Record the outcome of an admitted call"""
+        slow = duration >= self._slow_call_seconds
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["failures"] += failed
+            self._stats["slow_calls"] += slow
+
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= self._half_open_calls:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"{self.name} circuit closed")
+                return
+
+            self._outcomes.append((failed, slow))
+            if self._state == CLOSED and len(self._outcomes) >= self._min_calls:
+                bad = sum(1 for failed, slow in self._outcomes if failed or slow)
+                if bad / len(self._outcomes) >= self._failure_rate:
+                    self._open()
+
+    def stats(self) -> dict:
+        state = self.state
+        with self._lock:
+            window = len(self._outcomes)
+            bad = sum(1 for failed, slow in self._outcomes if failed or slow)
+            return {
+                "state": state,
+                "window_calls": window,
+                "window_failure_rate": round(bad / window, 3) if window else 0.0,
+                "retry_after": self._retry_after() if state == OPEN else 0,
+                **self._stats
+            }
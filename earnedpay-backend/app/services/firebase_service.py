@@ -1,8 +1,12 @@
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
 from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.read_policy import read_policy, DatastoreUnavailableError
 from typing import Optional
+import hashlib
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -37,31 +41,84 @@ class FirebaseService:
     
     async def verify_token(self, id_token: str) -> Optional[dict]:
         """Verify Firebase ID token and return decoded token"""
+        token_key = hashlib.sha256(id_token.encode()).hexdigest()
+        cached = cache_service.get("tokens", token_key)
+        if cached is not None:
+            return cached
+        
         try:
             decoded_token = auth.verify_id_token(id_token)
-            return decoded_token
         except Exception as e:
             logger.error(f"Token verification failed: {e}")
             return None
+        
+        # Never cache a token beyond its own expiry
+        ttl = min(decoded_token.get("exp", 0) - time.time(), settings.cache_default_ttl)
+        if ttl > 0:
+            cache_service.set("tokens", token_key, decoded_token, ttl)
+        return decoded_token
     
     async def get_user(self, uid: str) -> Optional[dict]:
         """Get user document from Firestore"""
+        cached = cache_service.get("users", uid)
+        if cached is not None:
+            return cached
+        
         try:
             user_ref = self._db.collection('users').document(uid)
-            user_doc = user_ref.get()
+            user_doc = await read_policy.call_async("users.get", user_ref.get)
             
             if user_doc.exists:
-                return {"uid": uid, **user_doc.to_dict()}
+                user = {"uid": uid, **user_doc.to_dict()}
+                cache_service.set("users", uid, user)
+                return user
             return None
+        except DatastoreUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Failed to get user {uid}: {e}")
             return None
     
+    async def get_user_with_profile(self, uid: str, profile_collection: str) -> tuple:
+        """
+        Get user document, fetching its role profile in the same round trip
+        
+        Returns (user, profile snapshot). When the user is served from cache
+        no read is made and the profile is returned as None (not fetched).
+        """
+        cached = cache_service.get("users", uid)
+        if cached is not None:
+            return cached, None
+        
+        try:
+            user_ref = self._db.collection('users').document(uid)
+            profile_ref = self._db.collection(profile_collection).document(uid)
+            docs = {
+                doc.reference.path: doc
+                for doc in await read_policy.call_async(
+                    "users.get_with_profile", lambda: list(self._db.get_all([user_ref, profile_ref]))
+                )
+            }
+            
+            user_doc = docs[user_ref.path]
+            if not user_doc.exists:
+                return None, None
+            
+            user = {"uid": uid, **user_doc.to_dict()}
+            cache_service.set("users", uid, user)
+            return user, docs[profile_ref.path]
+        except DatastoreUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get user {uid} with {profile_collection} profile: {e}")
+            return None, None
+    
     async def create_user(self, uid: str, user_data: dict) -> bool:
         """Create user document in Firestore"""
         try:
             user_ref = self._db.collection('users').document(uid)
             user_ref.set(user_data)
+            cache_service.invalidate("users", uid)
             logger.info(f"Created user {uid}")
             return True
         except Exception as e:
@@ -73,12 +130,47 @@ class FirebaseService:
         try:
             user_ref = self._db.collection('users').document(uid)
             user_ref.update(update_data)
+            cache_service.invalidate("users", uid)
             logger.info(f"Updated user {uid}")
             return True
         except Exception as e:
             logger.error(f"Failed to update user {uid}: {e}")
             return False
-
+    
+    async def get_worker_employer_id(self, worker_id: str) -> Optional[str]:
+        """Get the employer a worker belongs to (cached; it never changes)"""
+        cached = cache_service.get("worker_employer", worker_id)
+        if cached is not None:
+            return cached
+        
+        worker_ref = self._db.collection('workers').document(worker_id)
+        worker_doc = await read_policy.call_async("workers.get", worker_ref.get)
+        employer_id = worker_doc.to_dict().get('employerId') if worker_doc.exists else None
+        if employer_id is not None:
+            cache_service.set("worker_employer", worker_id, employer_id, ttl=86400)
+        return employer_id
+    
+    def invalidate_user(self, uid: str):
+        """Drop a cached user document after it is written outside this service"""
+        cache_service.invalidate("users", uid)
+    
+    async def get_employer(self, employer_id: str) -> Optional[dict]:
+        """Get employer document (cached), or None if it does not exist"""
+        cached = cache_service.get("employers", employer_id)
+        if cached is not None:
+            return cached
+        
+        employer_ref = self._db.collection('employers').document(employer_id)
+        employer_doc = await read_policy.call_async("employers.get", employer_ref.get)
+        if not employer_doc.exists:
+            return None
+        employer = employer_doc.to_dict()
+        cache_service.set("employers", employer_id, employer)
+        return employer
+    
+    def invalidate_employer(self, employer_id: str):
+        """Drop a cached employer document after it changes"""
+        cache_service.invalidate("employers", employer_id)
 
 # Singleton instance
 firebase_service = FirebaseService()
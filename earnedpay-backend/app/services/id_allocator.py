@@ -0,0 +1,77 @@
+from app.config import settings
+from app.services.firebase_service import firebase_service
+from firebase_admin import firestore
+from datetime import datetime
+from typing import Callable, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# First sequence number handed out; above the old random 4-digit EP-XXXX range
+FIRST_SEQUENCE = 10000
+
+
+def reserve_firestore_block(counter_name: str, block_size: int) -> int:
+    """
+    Atomically reserve `block_size` numbers from `counters/{counter_name}`
+
+    Returns:
+        First number of the reserved block
+    """
+    counter_ref = firebase_service.db.collection('counters').document(counter_name)
+    
+    @firestore.transactional
+    def reserve(transaction):
+        snapshot = counter_ref.get(transaction=transaction)
+        start = snapshot.get('next') if snapshot.exists else FIRST_SEQUENCE
+        transaction.set(counter_ref, {"next": start + block_size, "updatedAt": datetime.utcnow()})
+        return start
+    
+    return reserve(firebase_service.db.transaction())
+
+
+class IdAllocator:
+    """
+    Hand out unique sequential numbers from blocks reserved in Firestore
+
+    Each process reserves a block of `block_size` numbers with a single
+    transaction and serves IDs from memory until it runs out, so the
+    counter document sees one write per block rather than one per ID.
+    Numbers left in a block when the process exits are skipped, never reused.
+    """
+    
+    def __init__(
+        self,
+        counter_name: str,
+        block_size: int = 50,
+        reserve_block: Optional[Callable[[str, int], int]] = None
+    ):
+        self.counter_name = counter_name
+        self.block_size = block_size
+        self._reserve_block = reserve_block or reserve_firestore_block
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+        self.reservations = 0
+    
+    def next_id(self) -> int:
+        """Get the next unique number"""
+        with self._lock:
+            if self._next >= self._end:
+                start = self._reserve_block(self.counter_name, self.block_size)
+                self._next, self._end = start, start + self.block_size
+                self.reservations += 1
+                logger.info(f"Reserved {self.counter_name} IDs {start}-{self._end - 1}")
+            
+            value = self._next
+            self._next += 1
+            return value
+
+
+custom_id_allocator = IdAllocator("customIds", block_size=settings.custom_id_block_size)
+
+
+def next_custom_id() -> str:
+    """Allocate a user-facing customId (EP-<number>)"""
+    return f"EP-{custom_id_allocator.next_id()}"
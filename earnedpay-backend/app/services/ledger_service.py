@@ -0,0 +1,51 @@
+from app.services.firebase_service import firebase_service
+from app.services.wage_calculator import wage_calculator
+from app.utils.document_keys import ledger_doc_id
+from datetime import datetime
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerService:
+    """Create and locate monthly wage ledgers"""
+    
+    def ledger_ref(self, worker_id: str, month: str):
+        """Get the document reference for a worker's ledger in a month"""
+        return firebase_service.db.collection('wage_ledgers').document(ledger_doc_id(worker_id, month))
+    
+    def build_ledger(
+        self,
+        worker_id: str,
+        employer_id: str,
+        month: str,
+        payday_date: int,
+        reference: Optional[datetime] = None
+    ) -> dict:
+        """
+        Build an empty ledger document for a worker-month
+        
+        Args:
+            worker_id: Worker document ID
+            employer_id: Employer document ID
+            month: Month in YYYY-MM format
+            payday_date: Employer's payday (day of month)
+            reference: Moment the payday is computed from (defaults to now)
+        """
+        now = datetime.utcnow()
+        return {
+            "workerId": worker_id,
+            "employerId": employer_id,
+            "month": month,
+            "totalEarned": 0.0,
+            "totalWithdrawn": 0.0,
+            "availableBalance": 0.0,
+            "paydayDate": wage_calculator.get_next_payday(payday_date, reference),
+            "status": "active",
+            "createdAt": now,
+            "updatedAt": now
+        }
+
+
+ledger_service = LedgerService()
@@ -0,0 +1,136 @@
+from app.config import settings
+from typing import Optional
+import asyncio
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Request classes, most important first
+CRITICAL = "critical"
+LIGHT = "light"
+NORMAL = "normal"
+HEAVY = "heavy"
+
+# Paths that must keep answering even under overload
+CRITICAL_PATHS = {"/health", "/"}
+
+# Routes whose per-request cost scales with the size of the employer
+HEAVY_PATHS = {
+    "/api/employers/attendance",
+    "/api/employers/me/attendance/analytics",
+    "/api/employers/me/workers/balances",
+    "/api/employers/me/workers/bulk",
+    "/api/employers/me/workers/bulk/csv",
+    "/api/settlements/process",
+}
+
+# Heavy routes with path parameters (matched before routing, so by pattern)
+HEAVY_PATTERNS = (
+    re.compile(r"^/api/settlements/[^/]+/(export|bank-file)$"),
+)
+
+# Fraction of capacity at which each class starts being shed
+SHED_THRESHOLDS = {
+    CRITICAL: None,
+    LIGHT: 1.0,
+    NORMAL: 0.8,
+    HEAVY: 0.5,
+}
+
+RETRY_AFTER = {
+    LIGHT: 1,
+    NORMAL: 2,
+    HEAVY: 10,
+}
+
+
+class LoadShedder:
+    """
+    Per-process admission control for incoming requests
+
+    Load is the larger of in-flight requests relative to `max_inflight` and
+    event loop lag (time queued work waits for the loop) relative to
+    `target_lag_ms`. Cheaper request classes tolerate more load before
+    being rejected, and health checks are never rejected.
+    """
+
+    def __init__(self, max_inflight: int = 64, target_lag_ms: float = 50.0):
+        self.max_inflight = max_inflight
+        self.target_lag = target_lag_ms / 1000
+        self.inflight = 0
+        self.lag = 0.0
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._stats = {"admitted": 0, "shed": {LIGHT: 0, NORMAL: 0, HEAVY: 0}}
+
+    @staticmethod
+    def classify(method: str, path: str) -> str:
+        """Assign a request to a priority class"""
+        if path in CRITICAL_PATHS:
+            return CRITICAL
+        if path in HEAVY_PATHS or any(pattern.match(path) for pattern in HEAVY_PATTERNS):
+            return HEAVY
+        if method in ("GET", "HEAD", "OPTIONS"):
+            return LIGHT
+        return NORMAL
+
+    @property
+    def pressure(self) -> float:
+        """Current load as a fraction of capacity"""
+        return max(self.inflight / self.max_inflight, self.lag / self.target_lag)
+
+    def admit(self, method: str, path: str) -> Optional[int]:
+        """
+        Decide whether to accept a request
+
+        Returns:
+            None if admitted (the caller must call `release`), otherwise
+            the Retry-After seconds for the 503 response
+        """
+        request_class = self.classify(method, path)
+        threshold = SHED_THRESHOLDS[request_class]
+
+        if threshold is not None and self.pressure >= threshold:
+            self._stats["shed"][request_class] += 1
+            return RETRY_AFTER[request_class]
+
+        self.inflight += 1
+        self._stats["admitted"] += 1
+        return None
+
+    def release(self):
+        self.inflight -= 1
+
+    async def _monitor_loop_lag(self, interval: float = 0.1):
+        """Track how late the event loop wakes us up, smoothed over ~1s"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            delay = max(0.0, time.monotonic() - start - interval)
+            self.lag = 0.9 * self.lag + 0.1 * delay
+
+    def start(self):
+        """Start the loop lag monitor (call from the app's startup)"""
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.get_event_loop().create_task(self._monitor_loop_lag())
+
+    def stop(self):
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "loop_lag_ms": round(self.lag * 1000, 1),
+            "pressure": round(self.pressure, 2),
+            "admitted": self._stats["admitted"],
+            "shed": dict(self._stats["shed"])
+        }
+
+
+load_shedder = LoadShedder(
+    max_inflight=settings.load_shed_max_inflight,
+    target_lag_ms=settings.load_shed_target_lag_ms
+)
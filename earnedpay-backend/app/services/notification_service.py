@@ -6,6 +6,9 @@ logger = logging.getLogger(__name__)
 class NotificationService:
     """Send notifications via WhatsApp/SMS"""
     
+    # Provider messages currently go through (see settings.notification_rate_limits)
+    provider = "whatsapp"
+    
     async def send_withdrawal_confirmation(
         self,
         phone_number: str,
@@ -0,0 +1,184 @@
+from app.config import settings
+from app.models.worker import WorkerImportRow, BulkImportRowResult, BulkImportReport
+from app.services.firebase_service import firebase_service
+from app.services.ledger_service import ledger_service
+from app.services.notification_service import notification_service
+from app.services.wage_calculator import wage_calculator
+from app.utils.batching import BatchWriter, MAX_BATCH_SIZE
+from pydantic import ValidationError
+from datetime import datetime
+import asyncio
+import csv
+import io
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Firestore allows at most 30 values in an 'in' filter
+PHONE_LOOKUP_CHUNK = 30
+
+# Rows committed per batch (each row writes a worker and a ledger)
+WORKERS_PER_BATCH = MAX_BATCH_SIZE // 2
+
+# Column names accepted in CSV uploads, mapped to WorkerImportRow fields
+CSV_COLUMNS = {
+    "full_name": "full_name",
+    "fullname": "full_name",
+    "name": "full_name",
+    "phone_number": "phone_number",
+    "phonenumber": "phone_number",
+    "phone": "phone_number",
+    "upi_id": "upi_id",
+    "upiid": "upi_id",
+    "upi": "upi_id",
+}
+
+
+class OnboardingService:
+    """Bulk worker onboarding"""
+
+    @staticmethod
+    def parse_csv(content: str) -> list[dict]:
+        """Parse a CSV upload into raw rows keyed by WorkerImportRow field names"""
+        reader = csv.DictReader(io.StringIO(content.lstrip("\ufeff")))
+        rows = []
+        for record in reader:
+            row = {}
+            for column, value in record.items():
+                field = CSV_COLUMNS.get((column or "").strip().lower().replace(" ", ""))
+                if field:
+                    row[field] = (value or "").strip()
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _existing_phone_numbers(phone_numbers: list[str]) -> set[str]:
+        """Phone numbers that already belong to a worker"""
+        existing = set()
+        workers = firebase_service.db.collection('workers')
+        for start in range(0, len(phone_numbers), PHONE_LOOKUP_CHUNK):
+            chunk = phone_numbers[start:start + PHONE_LOOKUP_CHUNK]
+            query = workers.where('phoneNumber', 'in', chunk).select(['phoneNumber'])
+            existing.update(doc.get('phoneNumber') for doc in query.stream())
+        return existing
+
+    def import_workers(
+        self,
+        employer_id: str,
+        employer_data: dict,
+        rows: list[dict]
+    ) -> tuple[BulkImportReport, list[dict]]:
+        """
+        Validate, deduplicate and create workers with their initial ledgers
+
+        Returns:
+            (report, created) where created holds the worker documents written
+        """
+        results = []
+        valid = []
+
+        # Validate every row in one pass so the report lists all problems
+        for index, raw in enumerate(rows, start=1):
+            try:
+                valid.append((index, WorkerImportRow.model_validate(raw)))
+            except ValidationError as e:
+                reason = "; ".join(
+                    f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+                )
+                results.append(BulkImportRowResult(
+                    row=index, status="failed", phone_number=raw.get("phone_number"), reason=reason
+                ))
+
+        existing = self._existing_phone_numbers(sorted({row.phone_number for _, row in valid}))
+
+        payday_date = employer_data.get('withdrawalConfig', {}).get('paydayDate', 1)
+        next_payday = wage_calculator.get_next_payday(payday_date)
+        current_month = datetime.utcnow().strftime("%Y-%m")
+
+        pending = []
+        seen = set()
+        for index, row in valid:
+            if row.phone_number in existing or row.phone_number in seen:
+                results.append(BulkImportRowResult(
+                    row=index, status="skipped", phone_number=row.phone_number,
+                    reason="A worker with this phone number already exists"
+                ))
+                continue
+            seen.add(row.phone_number)
+
+            worker_id = str(uuid.uuid4())
+            pending.append((index, worker_id, {
+                "employerId": employer_id,
+                "fullName": row.full_name,
+                "phoneNumber": row.phone_number,
+                "upiId": row.upi_id,
+                "joinedAt": datetime.utcnow(),
+                "isActive": True,
+                "currentMonthEarnings": 0.0,
+                "totalWithdrawn": 0.0,
+                "nextPayday": next_payday
+            }))
+
+        # Each chunk (worker + ledger per row) is one batch commit; a failed
+        # commit marks only its own rows failed and the import carries on
+        created = []
+        for start in range(0, len(pending), WORKERS_PER_BATCH):
+            chunk = pending[start:start + WORKERS_PER_BATCH]
+            try:
+                with BatchWriter(firebase_service.db) as writer:
+                    for _, worker_id, worker_doc_data in chunk:
+                        writer.set(firebase_service.db.collection('workers').document(worker_id), worker_doc_data)
+                        writer.set(
+                            ledger_service.ledger_ref(worker_id, current_month),
+                            ledger_service.build_ledger(worker_id, employer_id, current_month, payday_date)
+                        )
+            except Exception as e:
+                logger.error(f"Bulk import batch for employer {employer_id} failed: {e}")
+                results.extend(
+                    BulkImportRowResult(
+                        row=index, status="failed", phone_number=worker_doc_data["phoneNumber"],
+                        reason="Could not save this worker; please retry"
+                    )
+                    for index, _, worker_doc_data in chunk
+                )
+                continue
+
+            for index, worker_id, worker_doc_data in chunk:
+                created.append({"id": worker_id, **worker_doc_data})
+                results.append(BulkImportRowResult(
+                    row=index, status="created", worker_id=worker_id, phone_number=worker_doc_data["phoneNumber"]
+                ))
+
+        results.sort(key=lambda result: result.row)
+        report = BulkImportReport(
+            created=sum(1 for result in results if result.status == "created"),
+            skipped=sum(1 for result in results if result.status == "skipped"),
+            failed=sum(1 for result in results if result.status == "failed"),
+            rows=results
+        )
+        logger.info(
+            f"Bulk import for employer {employer_id}: "
+            f"{report.created} created, {report.skipped} skipped, {report.failed} failed"
+        )
+        return report, created
+
+    async def send_invites(self, employer_name: str, workers: list[dict], concurrency: int = 10):
+        """Send invitations to newly onboarded workers with bounded concurrency"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def invite(worker: dict):
+            async with semaphore:
+                try:
+                    await notification_service.send_worker_invite(
+                        phone_number=worker["phoneNumber"],
+                        employer_name=employer_name,
+                        invite_link=f"{settings.app_url}/login"
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to invite {worker['phoneNumber']}: {e}")
+
+        await asyncio.gather(*(invite(worker) for worker in workers))
+
+
+onboarding_service = OnboardingService()
@@ -0,0 +1,195 @@
+from app.dependencies import get_current_user
+from app.services.cache_service import cache_service
+from fastapi import Depends, HTTPException, status
+from typing import Awaitable, Callable, Optional, Union
+import inspect
+import logging
+import math
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryRateLimitBackend:
+    """Token buckets and concurrency counters local to this process"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: float, capacity: float) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def acquire(self, key: str, limit: int, ttl: int) -> Optional[str]:
+        """Take a concurrency slot if fewer than `limit` are held; returns the slot token"""
+        with self._lock:
+            if self._counters.get(key, 0) >= limit:
+                return None
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return uuid.uuid4().hex
+
+    def release(self, key: str, token: str):
+        with self._lock:
+            self._counters[key] = max(0, self._counters.get(key, 0) - 1)
+
+
+class RedisRateLimitBackend:
+    """Token buckets and concurrency counters shared through the cache's Redis store"""
+
+    # KEYS[1] bucket; ARGV: rate, capacity, now. Returns wait time in ms (0 = allowed).
+    TOKEN_BUCKET_SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = math.ceil((1 - tokens) / rate * 1000)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return wait
+    """
+
+    # KEYS[1] sorted set of held slots (token -> acquired at); ARGV: limit,
+    # ttl, now, token. Slots older than the TTL were leaked by a crashed
+    # worker and are dropped first. Returns 1 if a slot was taken.
+    ACQUIRE_SCRIPT = """
+    local now = tonumber(ARGV[3])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[2]))
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+    return 1
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._token_bucket = client.register_script(self.TOKEN_BUCKET_SCRIPT)
+        self._acquire = client.register_script(self.ACQUIRE_SCRIPT)
+
+    def consume(self, key: str, rate: float, capacity: float) -> float:
+        wait_ms = self._token_bucket(keys=[f"earnedpay:ratelimit:{key}"], args=[rate, capacity, time.time()])
+        return int(wait_ms) / 1000
+
+    def acquire(self, key: str, limit: int, ttl: int) -> Optional[str]:
+        # Each slot expires on its own after `ttl`, so a leaked slot is
+        # reclaimed even while other requests keep the key alive
+        token = uuid.uuid4().hex
+        acquired = self._acquire(keys=[f"earnedpay:concurrency:{key}"], args=[limit, ttl, time.time(), token])
+        return token if acquired else None
+
+    def release(self, key: str, token: str):
+        self._client.zrem(f"earnedpay:concurrency:{key}", token)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limits and concurrency caps exposed as FastAPI dependencies
+
+    Uses the shared Redis backend when the cache has one, so limits hold
+    across gunicorn workers; otherwise falls back to per-process state.
+    Backend errors fail open so an unhealthy store never blocks requests.
+    """
+
+    def __init__(self):
+        self.local = InMemoryRateLimitBackend()
+        self.shared = RedisRateLimitBackend(cache_service.redis) if cache_service.redis is not None else None
+
+    @property
+    def backend(self):
+        return self.shared or self.local
+
+    @staticmethod
+    def _too_many(retry_after: float, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def check(self, scope: str, key: str, per_minute: float, burst: int):
+        """Consume one token for `scope:key`, raising 429 if the bucket is empty"""
+        try:
+            retry_after = self.backend.consume(f"{scope}:{key}", per_minute / 60, burst)
+        except Exception as e:
+            logger.warning(f"Rate limit check failed for {scope}: {e}")
+            return
+
+        if retry_after > 0:
+            logger.info(f"Rate limited {scope} for {key}, retry in {retry_after:.1f}s")
+            raise self._too_many(retry_after, "Too many requests. Please try again shortly.")
+
+    def limit(
+        self,
+        scope: str,
+        per_minute: float,
+        burst: int,
+        key_func: Callable[[dict], Union[Optional[str], Awaitable[Optional[str]]]]
+    ):
+        """
+        Build a dependency enforcing a token bucket per key
+
+        Args:
+            scope: Name of the limit, shared by every route using it
+            per_minute: Sustained requests per minute
+            burst: Bucket capacity
+            key_func: Maps the current user to the bucket key (None skips the
+                check); may be a coroutine function
+        """
+        async def dependency(current_user: dict = Depends(get_current_user)):
+            key = key_func(current_user)
+            if inspect.isawaitable(key):
+                key = await key
+            if key is not None:
+                self.check(scope, key, per_minute, burst)
+
+        return dependency
+
+    def concurrency(self, scope: str, limit: int, retry_after: int = 2, ttl: int = 60):
+        """Build a dependency that holds one of `limit` slots for the request's duration"""
+        async def dependency():
+            try:
+                token = self.backend.acquire(scope, limit, ttl)
+            except Exception as e:
+                logger.warning(f"Concurrency check failed for {scope}: {e}")
+                yield
+                return
+
+            if token is None:
+                logger.info(f"Concurrency limit reached for {scope} ({limit})")
+                raise self._too_many(retry_after, "Service is busy. Please try again shortly.")
+
+            try:
+                yield
+            finally:
+                try:
+                    self.backend.release(scope, token)
+                except Exception as e:
+                    logger.warning(f"Concurrency release failed for {scope}: {e}")
+
+        return dependency
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,233 @@
+from app.config import settings
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from google.api_core import exceptions as google_exceptions
+from typing import Callable, Optional, TypeVar
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors worth retrying for idempotent reads
+TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+# Latency samples kept per operation, and needed before hedging starts
+LATENCY_WINDOW = 256
+MIN_HEDGE_SAMPLES = 20
+
+
+class DatastoreUnavailableError(Exception):
+    """Raised when a read still fails after its retries or deadline"""
+
+
+class _AttemptTimeout(Exception):
+    pass
+
+
+class _OperationStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ReadPolicy:
+    """
+    Deadlines, jittered retries and hedged requests for Firestore reads
+
+    Each attempt runs on a small thread pool. If it has not answered after
+    the operation's recent p95 latency, an identical hedge request is sent
+    and whichever answers first wins; the loser is abandoned. Transient
+    errors and slow attempts are retried with full-jitter backoff until the
+    deadline. Only use this for idempotent reads.
+    """
+
+    def __init__(self, pool_size: int):
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="read-policy")
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _operation(self, operation: str) -> _OperationStats:
+        with self._lock:
+            return self._stats.setdefault(operation, _OperationStats())
+
+    def _hedge_delay(self, stats: _OperationStats) -> Optional[float]:
+        if not settings.read_hedge_enabled or len(stats.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        return max(stats.percentile(0.95), settings.read_hedge_min_delay_ms / 1000)
+
+    def _attempt(self, fn: Callable[[], T], stats: _OperationStats, deadline: float, hedge: bool) -> T:
+        started = time.monotonic()
+        delay = self._hedge_delay(stats) if hedge else None
+        hedge_at = started + delay if delay is not None else None
+
+        hedged = None
+        error = None
+        pending = {self._executor.submit(fn)}
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                raise _AttemptTimeout("deadline exceeded")
+
+            timeout = deadline - now
+            if hedge_at is not None and hedged is None:
+                timeout = min(timeout, max(0.0, hedge_at - now))
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    stats.latencies.append(time.monotonic() - started)
+                    if future is hedged:
+                        stats.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+
+            if not done and hedged is None and hedge_at is not None and time.monotonic() >= hedge_at:
+                hedged = self._executor.submit(fn)
+                pending.add(hedged)
+                stats.hedges += 1
+
+        raise error
+
+    async def _attempt_async(self, fn: Callable[[], T], stats: _OperationStats, deadline: float, hedge: bool) -> T:
+        """`_attempt` awaiting the pool futures instead of blocking on them"""
+        started = time.monotonic()
+        delay = self._hedge_delay(stats) if hedge else None
+        hedge_at = started + delay if delay is not None else None
+
+        hedged = None
+        error = None
+        pending = {asyncio.wrap_future(self._executor.submit(fn))}
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    raise _AttemptTimeout("deadline exceeded")
+
+                timeout = deadline - now
+                if hedge_at is not None and hedged is None:
+                    timeout = min(timeout, max(0.0, hedge_at - now))
+
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        stats.latencies.append(time.monotonic() - started)
+                        if future is hedged:
+                            stats.hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+
+                if not done and hedged is None and hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedged = asyncio.wrap_future(self._executor.submit(fn))
+                    pending.add(hedged)
+                    stats.hedges += 1
+
+            raise error
+        finally:
+            # Abandon the losers without leaving unretrieved exceptions behind
+            for future in pending:
+                future.cancel()
+
+    def _backoff(self, operation: str, stats: _OperationStats, attempt: int, deadline: float, error: Exception) -> float:
+        """Seconds to wait before retrying, or raise if the retries or deadline are used up"""
+        remaining = deadline - time.monotonic()
+        if attempt >= settings.read_retries or remaining <= 0:
+            stats.failures += 1
+            logger.warning(f"Read {operation} failed after {attempt + 1} attempts: {error}")
+            raise DatastoreUnavailableError(f"{operation} unavailable") from error
+
+        stats.retries += 1
+        return min(random.uniform(0, settings.read_retry_base_ms / 1000 * 2 ** attempt), remaining)
+
+    def call(
+        self,
+        operation: str,
+        fn: Callable[[], T],
+        deadline_ms: Optional[int] = None,
+        hedge: bool = True
+    ) -> T:
+        """
+        Run the read `fn` under the policy, blocking the calling thread
+
+        Use `call_async` from coroutines.
+
+        Raises:
+            DatastoreUnavailableError: if every attempt failed transiently or timed out
+        """
+        stats = self._operation(operation)
+        stats.calls += 1
+        deadline = time.monotonic() + (deadline_ms or settings.read_deadline_ms) / 1000
+
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(fn, stats, deadline, hedge)
+            except TRANSIENT_ERRORS + (_AttemptTimeout,) as e:
+                time.sleep(self._backoff(operation, stats, attempt, deadline, e))
+                attempt += 1
+
+    async def call_async(
+        self,
+        operation: str,
+        fn: Callable[[], T],
+        deadline_ms: Optional[int] = None,
+        hedge: bool = True
+    ) -> T:
+        """
+        Run the read `fn` under the policy without blocking the event loop
+
+        Raises:
+            DatastoreUnavailableError: if every attempt failed transiently or timed out
+        """
+        stats = self._operation(operation)
+        stats.calls += 1
+        deadline = time.monotonic() + (deadline_ms or settings.read_deadline_ms) / 1000
+
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt_async(fn, stats, deadline, hedge)
+            except TRANSIENT_ERRORS + (_AttemptTimeout,) as e:
+                await asyncio.sleep(self._backoff(operation, stats, attempt, deadline, e))
+                attempt += 1
+
+    def stats(self) -> dict:
+        """Per-operation latency percentiles and retry/hedge counters"""
+        with self._lock:
+            operations = dict(self._stats)
+
+        result = {}
+        for operation, stats in operations.items():
+            result[operation] = {
+                "calls": stats.calls,
+                "retries": stats.retries,
+                "failures": stats.failures,
+                "hedges": stats.hedges,
+                "hedge_wins": stats.hedge_wins,
+                "hedge_win_rate": round(stats.hedge_wins / stats.hedges, 3) if stats.hedges else 0.0,
+            }
+            for name, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+                value = stats.percentile(fraction)
+                result[operation][name] = round(value * 1000, 1) if value is not None else None
+        return result
+
+
+read_policy = ReadPolicy(pool_size=settings.read_pool_size)
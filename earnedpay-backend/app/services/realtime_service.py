@@ -0,0 +1,124 @@
+from app.services.firebase_service import firebase_service
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class EmployerChannel:
+    """
+    One pair of Firestore listeners per employer-month, shared by every
+    connected worker of that employer
+
+    Ledger and withdrawal changes arrive on Firestore's listener thread and
+    are handed to the subscribers' asyncio queues on the event loop.
+    """
+
+    def __init__(self, employer_id: str, month: str, loop: asyncio.AbstractEventLoop):
+        self.employer_id = employer_id
+        self.month = month
+        self._loop = loop
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.ledgers = {}
+        self._watches = []
+
+    def start(self):
+        db = firebase_service.db
+        month_start = datetime.strptime(self.month, "%Y-%m")
+
+        ledgers_query = db.collection('wage_ledgers') \
+            .where('employerId', '==', self.employer_id) \
+            .where('month', '==', self.month)
+        withdrawals_query = db.collection('withdrawals') \
+            .where('employerId', '==', self.employer_id) \
+            .where('requestedAt', '>=', month_start)
+
+        self._watches = [
+            ledgers_query.on_snapshot(self._on_ledgers),
+            withdrawals_query.on_snapshot(self._on_withdrawals),
+        ]
+        logger.info(f"Realtime listeners started for employer {self.employer_id} ({self.month})")
+
+    def stop(self):
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+        logger.info(f"Realtime listeners stopped for employer {self.employer_id} ({self.month})")
+
+    def _on_ledgers(self, docs, changes, read_time):
+        for change in changes:
+            data = change.document.to_dict()
+            worker_id = data.get('workerId')
+            self.ledgers[worker_id] = data
+            self._publish(worker_id, {"type": "ledger", "data": data})
+
+    def _on_withdrawals(self, docs, changes, read_time):
+        for change in changes:
+            data = {"id": change.document.id, **change.document.to_dict()}
+            self._publish(data.get('workerId'), {"type": "withdrawal", "data": data})
+
+    def _publish(self, worker_id: Optional[str], event: dict):
+        with self._lock:
+            queues = list(self._subscribers.get(worker_id, ()))
+        for queue in queues:
+            self._loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def add(self, worker_id: str, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.setdefault(worker_id, set()).add(queue)
+
+    def remove(self, worker_id: str, queue: asyncio.Queue) -> bool:
+        """Unregister a queue; returns True when no subscribers remain"""
+        with self._lock:
+            queues = self._subscribers.get(worker_id, set())
+            queues.discard(queue)
+            if not queues:
+                self._subscribers.pop(worker_id, None)
+            return not self._subscribers
+
+
+class RealtimeService:
+    """Fan out ledger and withdrawal changes to connected workers"""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def channel_count(self) -> int:
+        return len(self._channels)
+
+    @asynccontextmanager
+    async def subscribe(self, employer_id: str, worker_id: str):
+        """
+        Subscribe to a worker's ledger and withdrawal events
+
+        Yields the employer channel and a queue of events for the worker.
+        """
+        month = datetime.utcnow().strftime("%Y-%m")
+        key = (employer_id, month)
+        queue = asyncio.Queue()
+
+        async with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = EmployerChannel(employer_id, month, asyncio.get_running_loop())
+                await asyncio.to_thread(channel.start)
+                self._channels[key] = channel
+            channel.add(worker_id, queue)
+
+        try:
+            yield channel, queue
+        finally:
+            async with self._lock:
+                if channel.remove(worker_id, queue) and self._channels.get(key) is channel:
+                    del self._channels[key]
+                    await asyncio.to_thread(channel.stop)
+
+
+realtime_service = RealtimeService()
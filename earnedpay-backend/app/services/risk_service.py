@@ -0,0 +1,355 @@
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.firebase_service import firebase_service
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+SHARED_UPI_WINDOW = 7 * DAY
+
+# Per-worker amount history and last UPI ID are dropped after this long idle
+AMOUNT_HISTORY_TTL = 90 * DAY
+
+# Seconds between sweeps of idle keys in the in-memory store
+PRUNE_INTERVAL = 600
+
+
+@dataclass
+class RiskDecision:
+    score: int
+    action: str  # allow | review | block
+    reasons: list = field(default_factory=list)
+
+
+@dataclass
+class RiskSignals:
+    """Window statistics for one worker and UPI ID at the time of a withdrawal"""
+    withdrawals: list                       # timestamps in the last 24h
+    amount_count: int = 0
+    amount_mean: float = 0.0
+    amount_stddev: float = 0.0
+    upi_changed_at: Optional[float] = None
+    last_upi: Optional[str] = None
+    upi_workers: set = field(default_factory=set)   # workers using the UPI ID in 7 days
+
+
+class _AmountStats:
+    """Running mean and variance of a worker's withdrawal amounts (Welford)"""
+
+    __slots__ = ("count", "mean", "m2", "updated")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.updated = 0.0
+
+    def add(self, amount: float, now: float):
+        self.count += 1
+        delta = amount - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (amount - self.mean)
+        self.updated = now
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class InMemoryRiskStore:
+    """Sliding windows local to this process, swept of idle keys periodically"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._withdrawals = {}      # worker_id -> deque of timestamps (last 24h)
+        self._amounts = {}          # worker_id -> _AmountStats
+        self._upi_changes = {}      # worker_id -> timestamp of last UPI change
+        self._last_upi = {}         # worker_id -> UPI ID of last withdrawal
+        self._upi_workers = {}      # upi_id -> {worker_id: last seen timestamp}
+        self._pruned_at = time.time()
+
+    def _recent(self, worker_id: str, now: float) -> deque:
+        timestamps = self._withdrawals.setdefault(worker_id, deque())
+        while timestamps and timestamps[0] <= now - DAY:
+            timestamps.popleft()
+        return timestamps
+
+    def _upi_sharers(self, upi_id: str, now: float) -> dict:
+        workers = self._upi_workers.setdefault(upi_id, {})
+        for worker_id in [w for w, seen in workers.items() if seen <= now - SHARED_UPI_WINDOW]:
+            del workers[worker_id]
+        return workers
+
+    def _prune(self, now: float):
+        """Drop keys whose windows are empty or whose history has gone idle"""
+        if now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+
+        for worker_id in list(self._withdrawals):
+            if not self._recent(worker_id, now):
+                del self._withdrawals[worker_id]
+        for upi_id in list(self._upi_workers):
+            if not self._upi_sharers(upi_id, now):
+                del self._upi_workers[upi_id]
+        for worker_id in [w for w, changed_at in self._upi_changes.items() if changed_at <= now - DAY]:
+            del self._upi_changes[worker_id]
+        for worker_id in [w for w, stats in self._amounts.items() if stats.updated <= now - AMOUNT_HISTORY_TTL]:
+            del self._amounts[worker_id]
+            self._last_upi.pop(worker_id, None)
+
+    def snapshot(self, worker_id: str, upi_id: str, now: float) -> RiskSignals:
+        with self._lock:
+            self._prune(now)
+            stats = self._amounts.get(worker_id)
+            return RiskSignals(
+                withdrawals=list(self._recent(worker_id, now)),
+                amount_count=stats.count if stats else 0,
+                amount_mean=stats.mean if stats else 0.0,
+                amount_stddev=stats.stddev if stats else 0.0,
+                upi_changed_at=self._upi_changes.get(worker_id),
+                last_upi=self._last_upi.get(worker_id),
+                upi_workers=set(self._upi_sharers(upi_id, now))
+            )
+
+    def record_withdrawal(self, worker_id: str, upi_id: str, amount: float, now: float):
+        with self._lock:
+            self._recent(worker_id, now).append(now)
+            self._amounts.setdefault(worker_id, _AmountStats()).add(amount, now)
+            self._last_upi[worker_id] = upi_id
+            self._upi_sharers(upi_id, now)[worker_id] = now
+
+    def record_upi_change(self, worker_id: str, now: float):
+        with self._lock:
+            self._upi_changes[worker_id] = now
+
+
+class RedisRiskStore:
+    """
+    Sliding windows shared by every process through the cache's Redis store
+
+    Windows are sorted sets trimmed by score on every write, and every key
+    carries a TTL matching its window, so idle workers and UPI IDs expire.
+    """
+
+    PREFIX = "earnedpay:risk"
+
+    def __init__(self, client):
+        self._client = client
+
+    def _keys(self, worker_id: str) -> dict:
+        return {
+            "withdrawals": f"{self.PREFIX}:withdrawals:{worker_id}",
+            "amounts": f"{self.PREFIX}:amounts:{worker_id}",
+            "upi_change": f"{self.PREFIX}:upi_change:{worker_id}",
+            "last_upi": f"{self.PREFIX}:last_upi:{worker_id}"
+        }
+
+    def _upi_key(self, upi_id: str) -> str:
+        return f"{self.PREFIX}:upi:{upi_id}"
+
+    def snapshot(self, worker_id: str, upi_id: str, now: float) -> RiskSignals:
+        keys = self._keys(worker_id)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.zrangebyscore(keys["withdrawals"], f"({now - DAY}", "+inf", withscores=True)
+        pipe.hmget(keys["amounts"], "count", "sum", "sumsq")
+        pipe.get(keys["upi_change"])
+        pipe.get(keys["last_upi"])
+        pipe.zrangebyscore(self._upi_key(upi_id), f"({now - SHARED_UPI_WINDOW}", "+inf")
+        withdrawals, (count, total, total_sq), upi_change, last_upi, upi_workers = pipe.execute()
+
+        count = int(float(count or 0))
+        total = float(total or 0.0)
+        total_sq = float(total_sq or 0.0)
+        mean = total / count if count else 0.0
+        variance = (total_sq - count * mean * mean) / (count - 1) if count > 1 else 0.0
+        return RiskSignals(
+            withdrawals=[score for _, score in withdrawals],
+            amount_count=count,
+            amount_mean=mean,
+            amount_stddev=math.sqrt(max(0.0, variance)),
+            upi_changed_at=float(upi_change) if upi_change else None,
+            last_upi=last_upi,
+            upi_workers=set(upi_workers)
+        )
+
+    def record_withdrawal(self, worker_id: str, upi_id: str, amount: float, now: float):
+        keys = self._keys(worker_id)
+        upi_key = self._upi_key(upi_id)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.zadd(keys["withdrawals"], {f"{now:.6f}:{uuid.uuid4().hex[:8]}": now})
+        pipe.zremrangebyscore(keys["withdrawals"], "-inf", now - DAY)
+        pipe.expire(keys["withdrawals"], DAY)
+        pipe.hincrbyfloat(keys["amounts"], "count", 1)
+        pipe.hincrbyfloat(keys["amounts"], "sum", amount)
+        pipe.hincrbyfloat(keys["amounts"], "sumsq", amount * amount)
+        pipe.expire(keys["amounts"], AMOUNT_HISTORY_TTL)
+        pipe.set(keys["last_upi"], upi_id, ex=AMOUNT_HISTORY_TTL)
+        pipe.zadd(upi_key, {worker_id: now})
+        pipe.zremrangebyscore(upi_key, "-inf", now - SHARED_UPI_WINDOW)
+        pipe.expire(upi_key, SHARED_UPI_WINDOW)
+        pipe.execute()
+
+    def record_upi_change(self, worker_id: str, now: float):
+        self._client.set(self._keys(worker_id)["upi_change"], now, ex=DAY)
+
+
+class DecisionRecorder:
+    """Write risk decisions to Firestore from a background thread in batches"""
+
+    def __init__(self, flush_interval: float = 1.0, max_batch: int = 200):
+        self._queue = queue.Queue()
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._thread = threading.Thread(target=self._run, name="risk-decisions", daemon=True)
+        self._thread.start()
+
+    def record(self, decision_data: dict):
+        self._queue.put(decision_data)
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self._flush_interval
+            while len(items) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                batch = firebase_service.db.batch()
+                for item in items:
+                    batch.set(firebase_service.db.collection('risk_decisions').document(), item)
+                batch.commit()
+            except Exception as e:
+                logger.error(f"Failed to record {len(items)} risk decisions: {e}")
+
+
+class RiskService:
+    """
+    Inline fraud scoring for withdrawals
+
+    Signals come from sliding-window statistics updated incrementally, so
+    `assess` never touches Firestore. Windows live in the shared Redis
+    store when the cache has one, so every gunicorn worker sees the same
+    history; otherwise (or if Redis fails) they are kept per process and
+    under-count rather than over-count. Decisions are persisted
+    asynchronously for review.
+    """
+
+    def __init__(self):
+        self.local = InMemoryRiskStore()
+        self.shared = RedisRiskStore(cache_service.redis) if cache_service.redis is not None else None
+        self._recorder = None
+
+    def _call(self, operation: str, *args):
+        """Run a store operation on the shared store, falling back to the local one"""
+        if self.shared is not None:
+            try:
+                return getattr(self.shared, operation)(*args)
+            except Exception as e:
+                logger.warning(f"Shared risk store {operation} failed: {e}")
+        return getattr(self.local, operation)(*args)
+
+    def assess(self, worker_id: str, upi_id: str, amount: float) -> RiskDecision:
+        """Score a withdrawal before it is paid out"""
+        now = time.time()
+        score = 0
+        reasons = []
+        signals = self._call("snapshot", worker_id, upi_id, now)
+
+        # Velocity
+        last_hour = sum(1 for ts in signals.withdrawals if ts > now - HOUR)
+        if last_hour >= settings.risk_max_withdrawals_per_hour:
+            score += 30
+            reasons.append(f"{last_hour} withdrawals in the last hour")
+        if len(signals.withdrawals) >= settings.risk_max_withdrawals_per_day:
+            score += 30
+            reasons.append(f"{len(signals.withdrawals)} withdrawals in the last 24h")
+
+        # UPI ID changed (via /me/upi) shortly before withdrawing
+        changed_at = signals.upi_changed_at
+        if changed_at and changed_at > now - HOUR:
+            score += 50
+            reasons.append("UPI ID changed within the last hour")
+        elif changed_at and changed_at > now - DAY:
+            score += 35
+            reasons.append("UPI ID changed within the last 24h")
+
+        # Paying out to a different UPI ID than the previous withdrawal
+        if signals.last_upi is not None and signals.last_upi != upi_id:
+            score += 15
+            reasons.append("UPI ID differs from the previous withdrawal")
+
+        # Same UPI ID used by several workers
+        sharers = signals.upi_workers - {worker_id}
+        if len(sharers) + 1 >= settings.risk_max_workers_per_upi:
+            score += 40
+            reasons.append(f"UPI ID used by {len(sharers) + 1} workers in 7 days")
+
+        # Amount far outside the worker's own history
+        if signals.amount_count >= 3:
+            mean = signals.amount_mean
+            stddev = signals.amount_stddev
+            if (stddev and (amount - mean) / stddev > 3) or amount > 3 * mean:
+                score += 25
+                reasons.append(f"Amount ₹{amount} far above usual ₹{mean:.0f}")
+
+        score = min(score, 100)
+        if score >= settings.risk_block_score:
+            action = "block"
+        elif score >= settings.risk_review_score:
+            action = "review"
+        else:
+            action = "allow"
+
+        return RiskDecision(score=score, action=action, reasons=reasons)
+
+    def record_withdrawal(self, worker_id: str, upi_id: str, amount: float):
+        """Update statistics after a withdrawal is paid"""
+        self._call("record_withdrawal", worker_id, upi_id, amount, time.time())
+
+    def record_upi_change(self, worker_id: str):
+        """Note that a worker changed their UPI ID"""
+        self._call("record_upi_change", worker_id, time.time())
+
+    def record_decision(
+        self,
+        decision: RiskDecision,
+        worker_id: str,
+        withdrawal_id: str,
+        upi_id: str,
+        amount: float
+    ):
+        """Persist a decision for review without blocking the request"""
+        if self._recorder is None:
+            self._recorder = DecisionRecorder()
+
+        self._recorder.record({
+            "workerId": worker_id,
+            "withdrawalId": withdrawal_id,
+            "upiId": upi_id,
+            "amount": amount,
+            "score": decision.score,
+            "action": decision.action,
+            "reasons": decision.reasons,
+            "createdAt": datetime.utcnow()
+        })
+
+
+risk_service = RiskService()
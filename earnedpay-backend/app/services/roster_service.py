@@ -0,0 +1,50 @@
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.firebase_service import firebase_service
+from typing import Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RosterService:
+    """
+    Cached set of each employer's active worker IDs
+
+    The roster is loaded with one ID-only query and shared through the
+    cache; it is invalidated whenever workers are added or deactivated.
+    """
+
+    def _load(self, employer_id: str) -> list[str]:
+        workers_query = firebase_service.db.collection('workers') \
+            .where('employerId', '==', employer_id) \
+            .where('isActive', '==', True) \
+            .select([])
+        return [doc.id for doc in workers_query.stream()]
+
+    def active_worker_ids(self, employer_id: str) -> set[str]:
+        """IDs of the employer's active workers"""
+        return set(cache_service.get_or_load(
+            "rosters", employer_id, lambda: self._load(employer_id), ttl=settings.roster_cache_ttl
+        ))
+
+    def invalidate(self, employer_id: str):
+        """Drop the cached roster after workers are added or deactivated"""
+        cache_service.invalidate("rosters", employer_id)
+
+    def find_unknown(self, employer_id: str, worker_ids: Iterable[str]) -> list[str]:
+        """
+        Return the IDs that are not active workers of the employer
+
+        If anything is unknown the roster is re-read once before answering,
+        so a worker added moments ago on another instance is not rejected.
+        """
+        worker_ids = set(worker_ids)
+        unknown = worker_ids - self.active_worker_ids(employer_id)
+        if unknown:
+            self.invalidate(employer_id)
+            unknown = worker_ids - self.active_worker_ids(employer_id)
+        return sorted(unknown)
+
+
+roster_service = RosterService()
@@ -0,0 +1,273 @@
+from app.services.firebase_service import firebase_service
+from app.services.version_index import version_index
+from app.utils.batching import BatchWriter
+from app.utils.document_keys import settlement_doc_id
+from datetime import datetime
+from google.api_core import exceptions as google_exceptions
+from typing import Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns of a settlement's per-worker report, in export order
+WORKER_LINE_FIELDS = ["workerId", "workerName", "earned", "withdrawn", "netPaid"]
+
+# Worker lines per page document (~150 bytes each, well under the 1 MiB limit)
+LINES_PAGE_SIZE = 500
+
+# Parent document fields needed for settlement summaries
+SUMMARY_FIELDS = ["month", "totalEarnings", "totalWithdrawals", "netSettlement", "settledAt", "status"]
+
+
+class NoActiveLedgersError(Exception):
+    """Raised when an employer has nothing left to settle for a month"""
+
+
+class SettlementService:
+    """
+    Read and write settlements and their per-worker lines
+
+    The parent `settlements/{id}` document holds totals only; worker lines
+    live in fixed-size pages at `settlements/{id}/lines/{00000..}`.
+    Settlements written before paging keep their lines in the parent's
+    `workerSettlements` array and are still readable.
+    """
+    
+    @staticmethod
+    def _page_id(page: int) -> str:
+        return f"{page:05d}"
+    
+    def write_settlement(self, settlement_ref, settlement_data: dict, worker_lines: list[dict]):
+        """
+        Write line pages, then create the parent document once every page exists
+        
+        Raises:
+            google.api_core.exceptions.AlreadyExists: if the settlement exists
+        """
+        pages = [
+            worker_lines[start:start + LINES_PAGE_SIZE]
+            for start in range(0, len(worker_lines), LINES_PAGE_SIZE)
+        ]
+        
+        with BatchWriter(firebase_service.db, chunk_size=20) as writer:
+            for page, lines in enumerate(pages):
+                writer.set(
+                    settlement_ref.collection('lines').document(self._page_id(page)),
+                    {"page": page, "lines": lines}
+                )
+        
+        settlement_ref.create({
+            **settlement_data,
+            "pageCount": len(pages),
+            "pageSize": LINES_PAGE_SIZE
+        })
+    
+    def process_settlement(self, employer_id: str, month: str) -> dict:
+        """
+        Settle an employer's active ledgers for a month
+        
+        Worker names are fetched in one batched read, the settlement record
+        is written before ledgers are marked settled (so a crash never
+        leaves settled ledgers without a record), and ledger updates are
+        committed in chunked batches.
+        
+        The settlement ID is `{employerId}_{month}` and the record is
+        written with create(), so a month is settled at most once. If a
+        settlement already exists (a crashed or concurrent run), the
+        ledgers it covers are marked settled and its result is returned.
+        
+        Raises:
+            NoActiveLedgersError: if there are no active ledgers for the month
+        """
+        db = firebase_service.db
+        settlement_ref = db.collection('settlements').document(settlement_doc_id(employer_id, month))
+        
+        existing_doc = settlement_ref.get()
+        if existing_doc.exists:
+            return self._finish_settlement(existing_doc)
+        
+        # Get all active ledgers for the month
+        ledgers_query = db.collection('wage_ledgers') \
+            .where('employerId', '==', employer_id) \
+            .where('month', '==', month) \
+            .where('status', '==', 'active')
+        
+        ledger_docs = ledgers_query.get()
+        
+        if not ledger_docs:
+            raise NoActiveLedgersError(f"No active ledgers found for {month}")
+        
+        # Get worker names in one round trip
+        worker_refs = [db.collection('workers').document(doc.get('workerId')) for doc in ledger_docs]
+        worker_names = {
+            doc.id: doc.get('fullName')
+            for doc in db.get_all(worker_refs, field_paths=['fullName'])
+            if doc.exists
+        }
+        
+        # Calculate settlement
+        total_earnings = 0.0
+        total_withdrawals = 0.0
+        worker_settlements = []
+        
+        for ledger_doc in ledger_docs:
+            ledger_data = ledger_doc.to_dict()
+            worker_id = ledger_data['workerId']
+            
+            earned = ledger_data.get('totalEarned', 0.0)
+            withdrawn = ledger_data.get('totalWithdrawn', 0.0)
+            
+            total_earnings += earned
+            total_withdrawals += withdrawn
+            
+            worker_settlements.append({
+                "workerId": worker_id,
+                "workerName": worker_names.get(worker_id) or 'Unknown',
+                "earned": earned,
+                "withdrawn": withdrawn,
+                "netPaid": earned - withdrawn
+            })
+        
+        net_settlement = total_earnings - total_withdrawals
+        
+        # Create settlement record (worker lines are stored in pages)
+        settlement_data = {
+            "employerId": employer_id,
+            "month": month,
+            "totalWorkers": len(worker_settlements),
+            "totalEarnings": total_earnings,
+            "totalWithdrawals": total_withdrawals,
+            "netSettlement": net_settlement,
+            "settledAt": datetime.utcnow(),
+            "status": "completed"
+        }
+        
+        try:
+            self.write_settlement(settlement_ref, settlement_data, worker_settlements)
+        except google_exceptions.AlreadyExists:
+            # Another run settled the month first; finish from its record
+            logger.warning(f"Settlement for employer {employer_id} ({month}) was created concurrently")
+            return self._finish_settlement(settlement_ref.get())
+        
+        # Mark ledgers as settled
+        self._mark_settled(ledger_docs)
+        version_index.touch(f"settlements/{employer_id}")
+        
+        logger.info(f"Settled {len(worker_settlements)} workers for employer {employer_id} ({month})")
+        return self._result(settlement_ref.id, settlement_data)
+    
+    @staticmethod
+    def _result(settlement_id: str, settlement_data: dict) -> dict:
+        return {
+            "settlement_id": settlement_id,
+            "total_earnings": settlement_data['totalEarnings'],
+            "total_withdrawals": settlement_data['totalWithdrawals'],
+            "net_settlement": settlement_data['netSettlement'],
+            "workers_count": settlement_data['totalWorkers']
+        }
+    
+    @staticmethod
+    def _mark_settled(ledger_docs):
+        """Mark ledgers settled in chunked batches"""
+        with BatchWriter(firebase_service.db) as writer:
+            for ledger_doc in ledger_docs:
+                writer.update(ledger_doc.reference, {
+                    "status": "settled",
+                    "updatedAt": datetime.utcnow()
+                })
+        
+        for ledger_doc in ledger_docs:
+            version_index.touch(f"wage_ledgers/{ledger_doc.id}")
+    
+    def _finish_settlement(self, settlement_doc) -> dict:
+        """Mark ledgers covered by an existing settlement that are still active"""
+        settlement_data = settlement_doc.to_dict()
+        employer_id = settlement_data['employerId']
+        month = settlement_data['month']
+        
+        settled_workers = {line['workerId'] for line in self.iter_worker_lines(settlement_doc)}
+        ledger_docs = [
+            doc for doc in firebase_service.db.collection('wage_ledgers')
+                .where('employerId', '==', employer_id)
+                .where('month', '==', month)
+                .where('status', '==', 'active')
+                .get()
+            if doc.get('workerId') in settled_workers
+        ]
+        if ledger_docs:
+            logger.warning(
+                f"Finishing settlement {settlement_doc.id}: marking {len(ledger_docs)} ledgers settled"
+            )
+            self._mark_settled(ledger_docs)
+        version_index.touch(f"settlements/{employer_id}")
+        
+        return self._result(settlement_doc.id, settlement_data)
+    
+    def get_settlement(self, settlement_id: str, employer_id: str):
+        """Get a settlement snapshot if it exists and belongs to the employer"""
+        settlement_doc = firebase_service.db.collection('settlements').document(settlement_id).get()
+        if not settlement_doc.exists or settlement_doc.get('employerId') != employer_id:
+            return None
+        return settlement_doc
+    
+    def iter_worker_lines(self, settlement_doc) -> Iterator[dict]:
+        """Yield the settlement's per-worker lines in order, one page read at a time"""
+        settlement_data = settlement_doc.to_dict()
+        if 'workerSettlements' in settlement_data:
+            yield from settlement_data['workerSettlements']
+            return
+        
+        lines_ref = settlement_doc.reference.collection('lines')
+        for page in range(settlement_data.get('pageCount', 0)):
+            page_doc = lines_ref.document(self._page_id(page)).get()
+            if not page_doc.exists:
+                logger.error(f"Settlement {settlement_doc.id} is missing line page {page}")
+                continue
+            yield from page_doc.get('lines')
+    
+    def iter_report_rows(self, settlement_doc) -> Iterator[list]:
+        """Yield per-worker lines as rows matching WORKER_LINE_FIELDS"""
+        for line in self.iter_worker_lines(settlement_doc):
+            yield [line.get(field) for field in WORKER_LINE_FIELDS]
+
+    
+    def iter_payment_lines(self, settlement_doc) -> Iterator[dict]:
+        """
+        Yield per-worker payments with the worker's bank details
+        
+        Bank details are fetched with one batched read per LINES_PAGE_SIZE
+        lines, so memory use stays flat however many workers were settled.
+        """
+        db = firebase_service.db
+        lines = []
+        
+        def with_bank_details(chunk: list[dict]) -> Iterator[dict]:
+            worker_refs = [db.collection('workers').document(line['workerId']) for line in chunk]
+            workers = {
+                doc.id: doc.to_dict()
+                for doc in db.get_all(worker_refs, field_paths=['bankAccount', 'upiId'])
+                if doc.exists
+            }
+            for line in chunk:
+                worker_data = workers.get(line['workerId'], {})
+                bank_account = worker_data.get('bankAccount') or {}
+                yield {
+                    "workerId": line['workerId'],
+                    "beneficiaryName": bank_account.get('accountHolderName') or line.get('workerName'),
+                    "accountNumber": bank_account.get('accountNumber'),
+                    "ifsc": bank_account.get('ifsc'),
+                    "upiId": worker_data.get('upiId'),
+                    "amount": line.get('netPaid', 0.0)
+                }
+        
+        for line in self.iter_worker_lines(settlement_doc):
+            lines.append(line)
+            if len(lines) >= LINES_PAGE_SIZE:
+                yield from with_bank_details(lines)
+                lines = []
+        
+        if lines:
+            yield from with_bank_details(lines)
+
+
+settlement_service = SettlementService()
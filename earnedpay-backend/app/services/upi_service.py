@@ -1,16 +1,47 @@
+import asyncio
+import time
 import uuid
 import logging
 from typing import Optional
 from datetime import datetime
+from app.config import settings
+from app.services.circuit_breaker import CircuitBreaker, OPEN
 
 logger = logging.getLogger(__name__)
 
 
 class UPIService:
-    """Mock UPI payout service"""
+    """Mock UPI payout service, guarded by a circuit breaker"""
     
     def __init__(self, mock_mode: bool = True):
         self.mock_mode = mock_mode
+        self.breaker = CircuitBreaker(
+            name="upi_gateway",
+            window=settings.upi_breaker_window,
+            min_calls=settings.upi_breaker_min_calls,
+            failure_rate=settings.upi_breaker_failure_rate,
+            slow_call_seconds=settings.upi_breaker_slow_call_seconds,
+            open_seconds=settings.upi_breaker_open_seconds,
+            half_open_calls=settings.upi_breaker_half_open_calls
+        )
+    
+    @property
+    def available(self) -> bool:
+        """False while the gateway circuit is open and calls would fail fast"""
+        return self.breaker.state != OPEN
+    
+    async def _guarded(self, call, *args) -> dict:
+        """Run a gateway call through the circuit breaker with a timeout"""
+        self.breaker.acquire()
+        started = time.monotonic()
+        failed = True
+        try:
+            result = await asyncio.wait_for(call(*args), timeout=settings.upi_timeout_seconds)
+            failed = False
+        finally:
+            # Also runs on cancellation, so a half-open trial slot is never leaked
+            self.breaker.record(time.monotonic() - started, failed=failed)
+        return result
     
     async def initiate_payout(
         self,
@@ -28,12 +59,15 @@ class UPIService:
                 "status": str,
                 "message": str
             }
+        
+        Raises:
+            CircuitOpenError: if the gateway circuit is open
         """
         if self.mock_mode:
-            return await self._mock_payout(upi_id, amount, reference_id)
+            return await self._guarded(self._mock_payout, upi_id, amount, reference_id)
         else:
             # Integrate with real UPI gateway (Razorpay, Cashfree, etc.)
-            return await self._real_payout(upi_id, amount, reference_id)
+            return await self._guarded(self._real_payout, upi_id, amount, reference_id)
     
     async def _mock_payout(
         self,
@@ -73,6 +107,9 @@ class UPIService:
     
     async def check_status(self, transaction_id: str) -> dict:
         """Check payout status"""
+        return await self._guarded(self._check_status, transaction_id)
+    
+    async def _check_status(self, transaction_id: str) -> dict:
         if self.mock_mode:
             return {
                 "transaction_id": transaction_id,
@@ -0,0 +1,49 @@
+from app.config import settings
+from app.services.cache_service import cache_service
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VersionIndex:
+    """
+    Latest known version of each resource, kept in the shared cache
+
+    Conditional GETs compare the client's ETag against the indexed version
+    and answer 304 without reading Firestore. Writers `touch` a resource so
+    the next read re-derives its version; entries also expire after
+    `etag_version_ttl` seconds to bound staleness from writes made outside
+    the API. The jobs' touches only reach the API through the shared cache,
+    so they must run with the same `CACHE_REDIS_URL` (see render.yaml);
+    otherwise their writes can be answered with 304 for up to that TTL.
+    """
+    
+    NAMESPACE = "versions"
+    
+    def get(self, resource: str) -> Optional[str]:
+        """Indexed version of a resource, or None if unknown"""
+        return cache_service.get(self.NAMESPACE, resource)
+    
+    def record(self, resource: str, version: str) -> str:
+        """Store the version just read from Firestore"""
+        cache_service.set(self.NAMESPACE, resource, version, settings.etag_version_ttl)
+        return version
+    
+    def record_snapshot(self, resource: str, snapshot) -> str:
+        """Index a document snapshot by its Firestore update time"""
+        return self.record(resource, self.snapshot_version(snapshot))
+    
+    def touch(self, resource: str):
+        """Forget a resource's version after writing it"""
+        cache_service.invalidate(self.NAMESPACE, resource)
+    
+    @staticmethod
+    def snapshot_version(snapshot) -> str:
+        """Version of a document snapshot (its server-side update time)"""
+        if not snapshot.exists or snapshot.update_time is None:
+            return "missing"
+        return snapshot.update_time.isoformat()
+
+
+version_index = VersionIndex()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 
 class WageCalculator:
@@ -37,6 +37,23 @@ class WageCalculator:
             "available_to_withdraw": round(available, 2)
         }
     
+    @staticmethod
+    def calculate_available_balances(
+        ledgers: Iterable[dict],
+        max_percentage: int = 40
+    ) -> Iterator[dict]:
+        """
+        Calculate available balances for many ledgers with one withdrawal config
+        
+        Yields one `calculate_available_balance` result per ledger, in order.
+        """
+        for ledger_data in ledgers:
+            yield WageCalculator.calculate_available_balance(
+                ledger_data.get('totalEarned', 0.0),
+                ledger_data.get('totalWithdrawn', 0.0),
+                max_percentage
+            )
+    
     @staticmethod
     def validate_withdrawal_amount(
         amount: float,
@@ -70,12 +87,13 @@ class WageCalculator:
         return round(hours_worked * wage_per_hour, 2)
     
     @staticmethod
-    def get_next_payday(payday_date: int) -> datetime:
+    def get_next_payday(payday_date: int, reference: Optional[datetime] = None) -> datetime:
         """
         Get next payday datetime
         
         Args:
             payday_date: Day of month (1-31)
+            reference: Compute the payday following this moment (defaults to now)
         
         Returns:
             Next payday datetime
@@ -83,7 +101,7 @@ class WageCalculator:
         from datetime import datetime
         from dateutil.relativedelta import relativedelta
         
-        now = datetime.utcnow()
+        now = reference or datetime.utcnow()
         current_month_payday = datetime(now.year, now.month, min(payday_date, 28))
         
         if now.day >= payday_date:
@@ -0,0 +1,216 @@
+"""
+Streaming bank bulk-payment files (NEFT/IMPS/UPI, CSV or fixed-width)
+
+A template is plain data: the columns of each detail record plus, for
+fixed-width files, header and trailer records. Files are written one chunk
+at a time; since the record count is only known at the end, control totals
+(count, amount in paise, SHA-256 of the detail records) go in the trailer.
+"""
+from app.utils.report_writers import CHUNK_ROWS
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+import csv
+import hashlib
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Column:
+    field: str
+    label: str = ""
+    width: int = 0          # fixed-width only
+    numeric: bool = False   # fixed-width only: right-aligned, zero padded
+
+
+@dataclass(frozen=True)
+class BankFileTemplate:
+    name: str
+    mode: str                       # NEFT | IMPS | UPI
+    layout: str                     # csv | fixed
+    columns: tuple
+    required: tuple                 # payment fields that must be present
+    header: tuple = ()              # fixed-width header record, over the file context
+    trailer: tuple = ()             # trailer record, over the control totals
+    extension: str = "csv"
+
+
+_TRAILER_COLUMNS = (
+    Column("recordType", width=1),
+    Column("count", width=9, numeric=True),
+    Column("totalPaise", width=15, numeric=True),
+    Column("checksum", width=64),
+)
+
+_ACCOUNT_CSV_COLUMNS = (
+    Column("mode", "Transaction Type"),
+    Column("beneficiaryName", "Beneficiary Name"),
+    Column("accountNumber", "Beneficiary Account Number"),
+    Column("ifsc", "IFSC"),
+    Column("amount", "Amount"),
+    Column("debitAccount", "Debit Account Number"),
+    Column("fileDate", "Value Date"),
+    Column("reference", "Payment Reference"),
+    Column("narration", "Narration"),
+)
+
+TEMPLATES = {
+    "neft_csv": BankFileTemplate(
+        name="neft_csv",
+        mode="NEFT",
+        layout="csv",
+        columns=_ACCOUNT_CSV_COLUMNS,
+        required=("accountNumber", "ifsc"),
+        trailer=_TRAILER_COLUMNS,
+    ),
+    "imps_csv": BankFileTemplate(
+        name="imps_csv",
+        mode="IMPS",
+        layout="csv",
+        columns=_ACCOUNT_CSV_COLUMNS,
+        required=("accountNumber", "ifsc"),
+        trailer=_TRAILER_COLUMNS,
+    ),
+    "upi_csv": BankFileTemplate(
+        name="upi_csv",
+        mode="UPI",
+        layout="csv",
+        columns=(
+            Column("mode", "Transaction Type"),
+            Column("beneficiaryName", "Beneficiary Name"),
+            Column("upiId", "Beneficiary VPA"),
+            Column("amount", "Amount"),
+            Column("debitAccount", "Debit Account Number"),
+            Column("reference", "Payment Reference"),
+            Column("narration", "Narration"),
+        ),
+        required=("upiId",),
+        trailer=_TRAILER_COLUMNS,
+    ),
+    "neft_fixed": BankFileTemplate(
+        name="neft_fixed",
+        mode="NEFT",
+        layout="fixed",
+        columns=(
+            Column("recordType", width=1),
+            Column("seq", width=6, numeric=True),
+            Column("mode", width=4),
+            Column("accountNumber", width=18),
+            Column("ifsc", width=11),
+            Column("beneficiaryName", width=35),
+            Column("amountPaise", width=15, numeric=True),
+            Column("reference", width=20),
+            Column("narration", width=30),
+        ),
+        required=("accountNumber", "ifsc"),
+        header=(
+            Column("recordType", width=1),
+            Column("fileDate", width=8),
+            Column("debitAccount", width=18),
+            Column("companyName", width=35),
+            Column("fileReference", width=20),
+        ),
+        trailer=_TRAILER_COLUMNS,
+        extension="txt",
+    ),
+}
+
+
+def _fixed_record(columns: tuple, values: dict) -> str:
+    parts = []
+    for column in columns:
+        value = values.get(column.field)
+        text = "" if value is None else str(value)
+        if column.numeric:
+            parts.append(text.rjust(column.width, "0")[-column.width:])
+        else:
+            parts.append(text.upper()[:column.width].ljust(column.width))
+    return "".join(parts) + "\n"
+
+
+def _csv_record(columns: tuple, values: dict) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow([values.get(column.field, "") for column in columns])
+    return buffer.getvalue()
+
+
+def find_unpayable(template: BankFileTemplate, payments: Iterable[dict]) -> list[dict]:
+    """
+    Payees the template cannot pay, as {"workerId", "reason"}
+
+    A payee is unpayable if they are owed money but miss a field the template
+    requires, or if their net amount is negative (withdrawn more than
+    earned). Payees owed exactly nothing are not listed.
+    """
+    unpayable = []
+    for payment in payments:
+        amount_paise = round(payment.get("amount", 0) * 100)
+        missing = [field for field in template.required if not payment.get(field)]
+        if amount_paise < 0:
+            unpayable.append({"workerId": payment.get("workerId"), "reason": "Negative net amount"})
+        elif amount_paise > 0 and missing:
+            unpayable.append({"workerId": payment.get("workerId"), "reason": f"Missing {', '.join(missing)}"})
+    return unpayable
+
+
+def stream_bank_file(template: BankFileTemplate, payments: Iterable[dict], context: dict) -> Iterator[bytes]:
+    """
+    Encode payments with `template`, yielding a chunk every CHUNK_ROWS records
+
+    Each payment carries `beneficiaryName`, `amount` (rupees) and the bank
+    fields the template needs. Callers reject files with `find_unpayable`
+    payees first; payees with nothing to pay, or whose details changed
+    since that check, are left out of the file and logged.
+    """
+    if template.layout == "fixed":
+        header = _fixed_record(template.header, {"recordType": "H", **context}) if template.header else ""
+    else:
+        header = ",".join(column.label or column.field for column in template.columns) + "\n"
+    yield header.encode("utf-8")
+
+    checksum = hashlib.sha256()
+    count = 0
+    total_paise = 0
+    skipped = 0
+    lines = []
+
+    for payment in payments:
+        amount_paise = round(payment.get("amount", 0) * 100)
+        if amount_paise <= 0 or any(not payment.get(field) for field in template.required):
+            skipped += 1
+            continue
+
+        count += 1
+        total_paise += amount_paise
+        record = {
+            **context,
+            **payment,
+            "recordType": "D",
+            "seq": count,
+            "mode": template.mode,
+            "reference": f"{context.get('fileReference', '')}{count:05d}",
+            "amount": f"{amount_paise / 100:.2f}",
+            "amountPaise": amount_paise,
+        }
+        if template.layout == "fixed":
+            line = _fixed_record(template.columns, record)
+        else:
+            line = _csv_record(template.columns, record)
+        checksum.update(line.encode("utf-8"))
+        lines.append(line)
+
+        if len(lines) >= CHUNK_ROWS:
+            yield "".join(lines).encode("utf-8")
+            lines = []
+
+    totals = {"recordType": "T", "count": count, "totalPaise": total_paise, "checksum": checksum.hexdigest()}
+    if template.layout == "fixed":
+        lines.append(_fixed_record(template.trailer, totals))
+    else:
+        lines.append(_csv_record(template.trailer, totals))
+    yield "".join(lines).encode("utf-8")
+
+    if skipped:
+        logger.warning(f"Bank file {context.get('fileReference')}: skipped {skipped} payments without {template.required} or amount")
@@ -0,0 +1,86 @@
+"""Chunked Firestore batched writes"""
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects batches with more than 500 operations
+MAX_BATCH_SIZE = 500
+
+
+class BatchWriter:
+    """
+    Accumulate Firestore writes and commit them in chunks
+
+    Usage:
+        with BatchWriter(db) as writer:
+            writer.set(ref, data)
+            writer.delete(other_ref)
+    """
+    
+    def __init__(self, db, chunk_size: int = MAX_BATCH_SIZE, dry_run: bool = False):
+        self._db = db
+        self.chunk_size = min(chunk_size, MAX_BATCH_SIZE)
+        self.dry_run = dry_run
+        self._batch = None
+        self._pending = 0
+        self.committed = 0
+        self.commits = 0
+    
+    def _ensure_batch(self):
+        if self._batch is None:
+            self._batch = self._db.batch()
+    
+    def _after_write(self):
+        self._pending += 1
+        if self._pending >= self.chunk_size:
+            self.flush()
+    
+    def set(self, ref, data: dict, merge: bool = False):
+        """Queue a set operation"""
+        self._ensure_batch()
+        self._batch.set(ref, data, merge=merge)
+        self._after_write()
+    
+    def update(self, ref, data: dict):
+        """Queue an update operation"""
+        self._ensure_batch()
+        self._batch.update(ref, data)
+        self._after_write()
+    
+    def create(self, ref, data: dict):
+        """Queue a create operation (fails the chunk if the document exists)"""
+        self._ensure_batch()
+        self._batch.create(ref, data)
+        self._after_write()
+    
+    def delete(self, ref):
+        """Queue a delete operation"""
+        self._ensure_batch()
+        self._batch.delete(ref)
+        self._after_write()
+    
+    def flush(self) -> Optional[int]:
+        """Commit pending writes, returning the number committed"""
+        if not self._pending:
+            return None
+        
+        count = self._pending
+        if self.dry_run:
+            logger.debug(f"Dry run: skipping commit of {count} writes")
+        else:
+            self._batch.commit()
+        
+        self.committed += count
+        self.commits += 1
+        self._batch = None
+        self._pending = 0
+        return count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
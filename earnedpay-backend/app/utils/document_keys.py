@@ -0,0 +1,34 @@
+"""Deterministic Firestore document IDs"""
+
+
+def ledger_doc_id(worker_id: str, month: str) -> str:
+    """
+    Wage ledger document ID for a worker and month
+
+    Args:
+        worker_id: Worker document ID
+        month: Month in YYYY-MM format
+    """
+    return f"{worker_id}_{month}"
+
+
+def attendance_doc_id(worker_id: str, date: str) -> str:
+    """
+    Attendance document ID for a worker and day
+
+    Args:
+        worker_id: Worker document ID
+        date: Day in YYYY-MM-DD format
+    """
+    return f"{worker_id}_{date}"
+
+
+def settlement_doc_id(employer_id: str, month: str) -> str:
+    """
+    Settlement document ID for an employer and month (one settlement each)
+
+    Args:
+        employer_id: Employer document ID
+        month: Month in YYYY-MM format
+    """
+    return f"{employer_id}_{month}"
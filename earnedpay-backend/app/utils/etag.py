@@ -0,0 +1,28 @@
+"""ETag helpers for conditional GET requests"""
+from fastapi import Request, Response
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values a response depends on"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already covers `etag`"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    
+    if if_none_match.strip() == "*":
+        return True
+    
+    # If-None-Match uses weak comparison, so ignore W/ prefixes
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the current ETag"""
+    return Response(status_code=304, headers={"ETag": etag})
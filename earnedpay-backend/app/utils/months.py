@@ -0,0 +1,14 @@
+"""Month (YYYY-MM) helpers"""
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+
+def month_bounds(month: str) -> tuple[datetime, datetime]:
+    """Start of the month and start of the following month"""
+    start = datetime.strptime(month, "%Y-%m")
+    return start, start + relativedelta(months=1)
+
+
+def next_month() -> str:
+    """Month following the current UTC month"""
+    return (datetime.utcnow().replace(day=1) + relativedelta(months=1)).strftime("%Y-%m")
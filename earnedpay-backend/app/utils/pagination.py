@@ -0,0 +1,20 @@
+"""Paginated Firestore query streaming"""
+from typing import Iterator
+
+
+def paginate(query, page_size: int = 500) -> Iterator:
+    """
+    Yield every document matched by `query`, fetching `page_size` at a time
+
+    The query must already be ordered; each page resumes after the last
+    document of the previous one, so no single request holds a long-lived
+    stream open.
+    """
+    page_query = query.limit(page_size)
+    while True:
+        docs = list(page_query.stream())
+        yield from docs
+        
+        if len(docs) < page_size:
+            return
+        page_query = query.start_after(docs[-1]).limit(page_size)
@@ -0,0 +1,140 @@
+"""Streaming CSV, JSON Lines and XLSX writers for report exports"""
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape
+import csv
+import io
+import json
+import zipfile
+
+# Rows encoded per yielded chunk
+CHUNK_ROWS = 500
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding a chunk every CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_jsonl(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """Encode rows as JSON objects, one per line"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(header, row)), default=str))
+        if len(lines) >= CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object collecting zip output until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float)):
+        text = "" if value is None else escape(str(value))
+        return f'<c t="inlineStr"><is><t>{text}</t></is></c>'
+    return f'<c><v>{value}</v></c>'
+
+
+def stream_xlsx(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """
+    Encode rows as a single-sheet XLSX workbook
+
+    The sheet XML is deflated straight into the zip stream (inline strings,
+    no shared string table), so memory use does not grow with row count.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+        yield sink.drain()
+
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(("<row>" + "".join(_xlsx_cell(value) for value in header) + "</row>").encode("utf-8"))
+
+            for count, row in enumerate(rows, start=1):
+                sheet.write(("<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>").encode("utf-8"))
+                if count % CHUNK_ROWS == 0:
+                    yield sink.drain()
+
+            sheet.write(b"</sheetData></worksheet>")
+
+    yield sink.drain()
+
+
+WRITERS = {
+    "csv": (stream_csv, "text/csv"),
+    "jsonl": (stream_jsonl, "application/x-ndjson"),
+    "xlsx": (stream_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
@@ -0,0 +1,26 @@
+"""Opaque sync tokens for delta sync endpoints"""
+from datetime import datetime, timedelta
+import base64
+
+# Tokens point this far before the sync started, so writes stamped before
+# the sync but committed after it are sent again rather than missed
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def make_sync_token(synced_at: datetime) -> str:
+    """Token for a sync that started at `synced_at` (naive UTC)"""
+    return base64.urlsafe_b64encode((synced_at - SYNC_OVERLAP).isoformat().encode()).decode().rstrip("=")
+
+
+def parse_sync_token(token: str) -> datetime:
+    """
+    Time (naive UTC) from which changes must be sent
+
+    Raises:
+        ValueError: if the token is malformed
+    """
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid sync token") from e